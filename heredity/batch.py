@@ -0,0 +1,99 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from heredity import load_data
+from elimination import compile_plan, infer, shape
+
+# Number of same-shape families handed to a worker at a time
+CHUNK = 64
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python batch.py (directory | pattern) [--workers N] [--output FILE]"
+    )
+    parser.add_argument("source")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--output", default=None,
+        help="file to write JSON lines to (default: standard output)"
+    )
+    args = parser.parse_args()
+
+    filenames = find_files(args.source)
+    if not filenames:
+        sys.exit(f"No family files match {args.source}")
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for line in process(filenames, args.workers):
+            print(line, file=output)
+    finally:
+        if args.output:
+            output.close()
+
+
+def find_files(source):
+    """
+    Return the sorted list of CSV files in directory `source`, or matching
+    glob pattern `source`.
+    """
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(glob.glob(source))
+
+
+def process(filenames, workers=None):
+    """
+    Run exact inference on every family in `filenames` and return one JSON
+    line per file, in the same order as `filenames`.
+
+    Families are grouped by pedigree shape, so each worker compiles the
+    plan for a shape once and reuses it for every family in its chunk.
+    """
+    families = [load_data(filename) for filename in filenames]
+
+    groups = dict()
+    for i, people in enumerate(families):
+        groups.setdefault(shape(people), []).append(i)
+    chunks = [
+        indices[start:start + CHUNK]
+        for indices in groups.values()
+        for start in range(0, len(indices), CHUNK)
+    ]
+
+    lines = [None] * len(filenames)
+    with ProcessPoolExecutor(workers) as executor:
+        results = executor.map(
+            infer_chunk,
+            [[(filenames[i], families[i]) for i in chunk] for chunk in chunks]
+        )
+        for chunk, chunk_lines in zip(chunks, results):
+            for i, line in zip(chunk, chunk_lines):
+                lines[i] = line
+    return lines
+
+
+def infer_chunk(families):
+    """
+    Return a JSON line for each (filename, people) pair in `families`, all
+    of which must have the same pedigree shape.
+    """
+    plan = compile_plan(shape(families[0][1]))
+    return [
+        json.dumps({"file": filename, "probabilities": infer(people, plan)})
+        for filename, people in families
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from heredity import enumerate_probabilities, normalize
+from elimination import infer
+
+# Largest pedigree the exponential enumeration is run on by default
+ENUMERATION_LIMIT = 7
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--sizes N ...] [--generations N ...] "
+              "[--observed F] [--seed N] [--output FILE]"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[3, 5, 7, 25, 100, 400],
+        help="number of people in each generated pedigree"
+    )
+    parser.add_argument(
+        "--generations", type=int, nargs="+", default=[2, 4],
+        help="number of generations in each generated pedigree"
+    )
+    parser.add_argument(
+        "--observed", type=float, default=0.5,
+        help="fraction of people whose trait is observed"
+    )
+    parser.add_argument(
+        "--enumeration-limit", type=int, default=ENUMERATION_LIMIT,
+        help="skip enumeration for pedigrees with more people than this"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="file to write JSON results to"
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'people':>6} {'gens':>4} {'engine':<12} "
+          f"{'seconds':>10} {'peak KiB':>10} {'max error':>10}")
+    for generations in args.generations:
+        for size in args.sizes:
+            people = generate_pedigree(size, generations, args.observed, rng)
+            for result in compare(people, args.enumeration_limit):
+                result["generations"] = generations
+                results.append(result)
+                error = result["error"]
+                print(f"{result['people']:>6} {generations:>4} "
+                      f"{result['engine']:<12} {result['seconds']:>10.4f} "
+                      f"{result['peak'] / 1024:>10.1f} "
+                      f"{'-' if error is None else f'{error:.1e}':>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def generate_pedigree(size, generations, observed, rng):
+    """
+    Return a random pedigree of `size` people spread over `generations`
+    generations, in the format returned by `heredity.load_data`.
+
+    The first generation are founders. Every later generation is made of
+    children of couples formed by a member of the previous generation and
+    a spouse who marries into the family (a new founder). Each person's
+    trait is observed with probability `observed`.
+    """
+    people = dict()
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": (rng.random() < 0.5 if rng.random() < observed
+                      else None)
+        }
+        return name
+
+    per_generation = max(2, size // max(1, generations))
+    previous = [add() for _ in range(min(size, per_generation))]
+    for generation in range(1, generations):
+        current = []
+        while len(people) < size and len(current) < per_generation:
+            spouse = add()
+            parents = [rng.choice(previous), spouse]
+            rng.shuffle(parents)
+            for _ in range(rng.randint(1, 3)):
+                if len(people) >= size:
+                    break
+                current.append(add(*parents))
+        if not current:
+            break
+        previous = current
+
+    # Any remaining people join the last generation as founders
+    while len(people) < size:
+        add()
+    return people
+
+
+def enumerate_exact(people):
+    """
+    Return the normalized probabilities of `people` computed by the
+    exhaustive `joint_probability` enumeration.
+    """
+    probabilities = enumerate_probabilities(people)
+    normalize(probabilities)
+    return probabilities
+
+
+ENGINES = {
+    "enumeration": enumerate_exact,
+    "elimination": infer
+}
+
+
+def measure(engine, people):
+    """
+    Run `engine` on `people` and return (probabilities, seconds, peak),
+    where `peak` is the peak memory in bytes allocated during a second,
+    traced run.
+    """
+    start = time.perf_counter()
+    probabilities = engine(people)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    engine(people)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return probabilities, seconds, peak
+
+
+def compare(people, enumeration_limit=ENUMERATION_LIMIT):
+    """
+    Run every engine on `people` and return a list of result dictionaries,
+    including each engine's largest difference from the first engine run
+    (enumeration where feasible).
+    """
+    results = []
+    reference = None
+    for name, engine in ENGINES.items():
+        if name == "enumeration" and len(people) > enumeration_limit:
+            continue
+        probabilities, seconds, peak = measure(engine, people)
+        error = None
+        if reference is None:
+            reference = probabilities
+        else:
+            error = max(
+                abs(probabilities[person][field][value]
+                    - reference[person][field][value])
+                for person in people
+                for field in reference[person]
+                for value in reference[person][field]
+            )
+        results.append({
+            "engine": name,
+            "people": len(people),
+            "seconds": seconds,
+            "peak": peak,
+            "error": error
+        })
+    return results
+
+
+if __name__ == "__main__":
+    main()
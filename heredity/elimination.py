@@ -0,0 +1,445 @@
+"""
+Exact heredity inference by variable elimination.
+
+A pedigree's structure (who is whose parent) is compiled once into a
+`Plan`: an elimination order, the clique tree it induces, and index tables
+that map every clique assignment onto the factors and separators it
+touches. Running a plan against a family with that structure is then a
+pass of messages up and down the tree, which is linear in the number of
+people for tree-shaped pedigrees instead of exponential.
+
+A `Session` keeps those messages between queries, so that changing one
+person's observed trait only recomputes the messages that depend on it.
+"""
+
+import functools
+import itertools
+
+from heredity import PROBS, get_parents
+
+
+class Model():
+    """
+    The `PROBS` tables compiled into flat lists indexed by gene count.
+    """
+
+    def __init__(self, probs=PROBS):
+
+        # prior[g] = P(g copies) for people without parents in the data
+        self.prior = [probs["gene"][genes] for genes in range(3)]
+
+        # trait[g][t] = P(trait t | g copies)
+        self.trait = [
+            {True: probs["trait"][genes][True],
+             False: probs["trait"][genes][False]}
+            for genes in range(3)
+        ]
+
+        # inheritance[c + 3 * m + 9 * f] = P(c copies | mother m, father f)
+        passed = [probs["mutation"], 0.5, 1 - probs["mutation"]]
+        self.inheritance = []
+        for father, mother, child in itertools.product(range(3), repeat=3):
+            m, f = passed[mother], passed[father]
+            self.inheritance.append([
+                (1 - m) * (1 - f),
+                (1 - m) * f + m * (1 - f),
+                m * f
+            ][child])
+
+
+MODEL = Model()
+
+
+def shape(people):
+    """
+    Return the structure of pedigree `people`: for each person, in file
+    order, the indices of their mother and father (or None for people whose
+    parents are not in the data). Families with the same shape share a plan.
+    """
+    index = {person: i for i, person in enumerate(people)}
+    return tuple(
+        (index[people[person]["mother"]], index[people[person]["father"]])
+        if get_parents(person, people) else None
+        for person in people
+    )
+
+
+class Plan():
+    """
+    A compiled elimination plan for one pedigree shape.
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        n = len(shape)
+
+        # Each person contributes one factor: a prior or an inheritance table
+        scopes = [
+            (i,) if parents is None else (i, parents[0], parents[1])
+            for i, parents in enumerate(shape)
+        ]
+
+        # Interaction graph between gene variables
+        neighbors = {i: set() for i in range(n)}
+        for scope in scopes:
+            for a, b in itertools.permutations(scope, 2):
+                neighbors[a].add(b)
+
+        # Eliminate greedily, preferring variables that add the fewest edges
+        self.order = []
+        self.cliques = []
+        remaining = set(range(n))
+        while remaining:
+            variable = min(remaining, key=lambda v: (
+                fill_in(neighbors, v), len(neighbors[v]), v
+            ))
+            clique = (variable,) + tuple(sorted(neighbors[variable]))
+            for a, b in itertools.combinations(neighbors[variable], 2):
+                neighbors[a].add(b)
+                neighbors[b].add(a)
+            for other in neighbors[variable]:
+                neighbors[other].discard(variable)
+            del neighbors[variable]
+            remaining.remove(variable)
+            self.order.append(variable)
+            self.cliques.append(clique)
+
+        # Each clique hangs off the clique of its first-eliminated neighbor
+        position = {variable: k for k, variable in enumerate(self.order)}
+        self.parent = []
+        for clique in self.cliques:
+            rest = clique[1:]
+            self.parent.append(
+                min(position[v] for v in rest) if rest else None
+            )
+        self.children = [[] for _ in self.cliques]
+        for k, parent in enumerate(self.parent):
+            if parent is not None:
+                self.children[parent].append(k)
+
+        # Person i's factor and trait evidence live in the clique eliminating i
+        self.home = [position[i] for i in range(n)]
+        self.factors = [[] for _ in self.cliques]
+        for i, scope in enumerate(scopes):
+            k = min(position[v] for v in scope)
+            self.factors[k].append((i, project(self.cliques[k], scope)))
+
+        # Map each clique's assignments onto the separator with its parent
+        self.up = []
+        self.down = []
+        for k, parent in enumerate(self.parent):
+            if parent is None:
+                self.up.append(None)
+                self.down.append(None)
+                continue
+            separator = self.cliques[k][1:]
+            self.up.append(project(self.cliques[k], separator))
+            self.down.append(project(self.cliques[parent], separator))
+
+    def potentials(self, people, model=MODEL):
+        """
+        Return the clique potentials for family `people` (which must have
+        this plan's shape): products of the prior or inheritance factor of
+        each person and the likelihood of their observed trait.
+        """
+        traits = [people[person]["trait"] for person in people]
+        return [
+            self.potential(k, traits, model) for k in range(len(self.cliques))
+        ]
+
+    def potential(self, k, traits, model=MODEL):
+        """
+        Return the potential of clique `k`, given the observed trait (or
+        None) of each person index in list `traits`.
+        """
+        table = [1.0] * 3 ** len(self.cliques[k])
+        for i, index in self.factors[k]:
+            values = (model.prior if self.shape[i] is None
+                      else model.inheritance)
+            for a, j in enumerate(index):
+                table[a] *= values[j]
+        trait = traits[self.cliques[k][0]]
+        if trait is not None:
+            likelihood = [model.trait[g][trait] for g in range(3)]
+            for a in range(len(table)):
+                table[a] *= likelihood[a % 3]
+        return table
+
+    def message(self, table, index, size):
+        """
+        Sum `table` down to a separator table of `size` entries, using the
+        clique-to-separator `index`, and rescale it to sum to 1.
+        """
+        result = [0.0] * size
+        for a, value in enumerate(table):
+            result[index[a]] += value
+        total = sum(result)
+        if total > 0:
+            result = [value / total for value in result]
+        return result
+
+    def gene_marginals(self, potentials):
+        """
+        Pass messages up and down the clique tree and return, for each
+        person index, their normalized gene distribution [P(0), P(1), P(2)].
+        """
+        count = len(self.cliques)
+        upward = [None] * count
+        downward = [None] * count
+
+        # Leaves to roots: cliques are numbered in elimination order
+        for k in range(count):
+            if self.parent[k] is None:
+                continue
+            table = list(potentials[k])
+            for child in self.children[k]:
+                absorb(table, upward[child], self.down[child])
+            upward[k] = self.message(
+                table, self.up[k], 3 ** (len(self.cliques[k]) - 1)
+            )
+
+        # Roots to leaves, then read off each eliminated variable
+        beliefs = [None] * count
+        for k in reversed(range(count)):
+            table = list(potentials[k])
+            if self.parent[k] is not None:
+                absorb(table, downward[k], self.up[k])
+            for child in self.children[k]:
+                absorb(table, upward[child], self.down[child])
+            beliefs[k] = table
+            for child in self.children[k]:
+                outgoing = list(table)
+                divide(outgoing, upward[child], self.down[child])
+                downward[child] = self.message(
+                    outgoing, self.down[child],
+                    3 ** (len(self.cliques[child]) - 1)
+                )
+
+        return [gene_marginal(beliefs[self.home[i]])
+                for i in range(len(self.shape))]
+
+
+class Session():
+    """
+    An inference session over one pedigree that caches clique tree
+    messages between queries.
+
+    `observe` and `retract` change one person's trait evidence and only
+    invalidate the messages that depend on it: the upward messages on the
+    path from that person's clique to the root, and the downward messages
+    into cliques off that path. Queries recompute stale messages lazily.
+    """
+
+    def __init__(self, people, model=MODEL):
+        self.people = {person: dict(people[person]) for person in people}
+        self.index = {person: i for i, person in enumerate(self.people)}
+        self.traits = [self.people[person]["trait"] for person in self.people]
+        self.model = model
+        self.plan = compile_plan(shape(self.people))
+        self.potentials = self.plan.potentials(self.people, model)
+        self.upward = [None] * len(self.plan.cliques)
+        self.downward = [None] * len(self.plan.cliques)
+
+    def observe(self, person, trait):
+        """
+        Record that `person` has (True) or does not have (False) the trait.
+        """
+        i = self.index[person]
+        self.people[person]["trait"] = trait
+        self.traits[i] = trait
+
+        k = self.plan.home[i]
+        self.potentials[k] = self.plan.potential(k, self.traits, self.model)
+
+        path = set()
+        while k is not None:
+            path.add(k)
+            self.upward[k] = None
+            k = self.plan.parent[k]
+        for k in range(len(self.downward)):
+            if k not in path:
+                self.downward[k] = None
+
+    def retract(self, person):
+        """
+        Forget any observation of `person`'s trait.
+        """
+        self.observe(person, None)
+
+    def query(self, person):
+        """
+        Return the normalized gene and trait distributions of `person`.
+        """
+        i = self.index[person]
+        genes = gene_marginal(self.belief(self.plan.home[i]))
+        return distribution(genes, self.traits[i], self.model)
+
+    def probabilities(self):
+        """
+        Return the normalized gene and trait probabilities of everyone, in
+        the same format as `infer`.
+        """
+        return {person: self.query(person) for person in self.people}
+
+    def belief(self, k):
+        """
+        Return the (unnormalized) belief of clique `k`: its potential times
+        every message into it.
+        """
+        plan = self.plan
+        table = list(self.potentials[k])
+        if plan.parent[k] is not None:
+            absorb(table, self.message_down(k), plan.up[k])
+        for child in plan.children[k]:
+            absorb(table, self.message_up(child), plan.down[child])
+        return table
+
+    def message_up(self, k):
+        """
+        Return the message from clique `k` to its parent, recomputing any
+        stale messages in the subtree below `k`.
+        """
+        plan = self.plan
+
+        # Cliques are numbered in elimination order, children first
+        stale = []
+        stack = [k]
+        while stack:
+            node = stack.pop()
+            if self.upward[node] is None:
+                stale.append(node)
+                stack.extend(plan.children[node])
+
+        for node in sorted(stale):
+            table = list(self.potentials[node])
+            for child in plan.children[node]:
+                absorb(table, self.upward[child], plan.down[child])
+            self.upward[node] = plan.message(
+                table, plan.up[node], 3 ** (len(plan.cliques[node]) - 1)
+            )
+        return self.upward[k]
+
+    def message_down(self, k):
+        """
+        Return the message from the parent of clique `k` into `k`,
+        recomputing any stale messages on the path from the root.
+        """
+        plan = self.plan
+
+        path = []
+        node = k
+        while plan.parent[node] is not None and self.downward[node] is None:
+            path.append(node)
+            node = plan.parent[node]
+
+        for node in reversed(path):
+            parent = plan.parent[node]
+            table = list(self.potentials[parent])
+            if plan.parent[parent] is not None:
+                absorb(table, self.downward[parent], plan.up[parent])
+            for child in plan.children[parent]:
+                if child != node:
+                    absorb(table, self.message_up(child), plan.down[child])
+            self.downward[node] = plan.message(
+                table, plan.down[node], 3 ** (len(plan.cliques[node]) - 1)
+            )
+        return self.downward[k]
+
+
+def gene_marginal(belief):
+    """
+    Return the normalized distribution [P(0), P(1), P(2)] of the first
+    variable of a clique from its `belief` table.
+    """
+    genes = [0.0, 0.0, 0.0]
+    for a, value in enumerate(belief):
+        genes[a % 3] += value
+    total = sum(genes)
+    return [value / total for value in genes]
+
+
+def distribution(genes, trait, model=MODEL):
+    """
+    Return a person's entry of a probability table, given their gene
+    distribution `genes` and their observed `trait` (or None).
+    """
+    if trait is None:
+        true = sum(genes[g] * model.trait[g][True] for g in range(3))
+    else:
+        true = float(trait)
+    return {
+        "gene": {2: genes[2], 1: genes[1], 0: genes[0]},
+        "trait": {True: true, False: 1 - true}
+    }
+
+
+def fill_in(neighbors, variable):
+    """
+    Return how many edges eliminating `variable` would add to the graph.
+    """
+    return sum(
+        1 for a, b in itertools.combinations(neighbors[variable], 2)
+        if b not in neighbors[a]
+    )
+
+
+def project(clique, scope):
+    """
+    Return a list mapping each assignment index of `clique` to the index of
+    its restriction to `scope`. Assignments are indexed in base 3 with the
+    first variable as the least significant digit.
+    """
+    positions = [clique.index(v) for v in scope]
+    index = []
+    for a in range(3 ** len(clique)):
+        digits = [(a // 3 ** p) % 3 for p in range(len(clique))]
+        index.append(sum(digits[p] * 3 ** s for s, p in enumerate(positions)))
+    return index
+
+
+def absorb(table, message, index):
+    """
+    Multiply separator `message` into clique `table` in place, then rescale
+    the table so its largest entry is 1. Tables are only ever normalized
+    afterwards, and a clique absorbing hundreds of messages would otherwise
+    underflow to zeros.
+    """
+    for a in range(len(table)):
+        table[a] *= message[index[a]]
+    largest = max(table)
+    if largest > 0:
+        for a in range(len(table)):
+            table[a] /= largest
+
+
+def divide(table, message, index):
+    """
+    Divide separator `message` out of clique `table` in place.
+    """
+    for a in range(len(table)):
+        value = message[index[a]]
+        table[a] = table[a] / value if value > 0 else 0.0
+
+
+@functools.lru_cache(maxsize=None)
+def compile_plan(shape):
+    """
+    Return the (cached) elimination plan for pedigree `shape`.
+    """
+    return Plan(shape)
+
+
+def infer(people, plan=None, model=MODEL):
+    """
+    Return the normalized gene and trait probabilities of `people`, in the
+    same format as `heredity.main` computes them, using `plan` (compiled
+    from the shape of `people` if not given).
+    """
+    if plan is None:
+        plan = compile_plan(shape(people))
+    marginals = plan.gene_marginals(plan.potentials(people, model))
+
+    return {
+        person: distribution(genes, people[person]["trait"], model)
+        for person, genes in zip(people, marginals)
+    }
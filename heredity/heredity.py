@@ -1,7 +1,10 @@
+import argparse
 import csv
 import itertools
-import sys
+import math
+import random
 import copy
+from concurrent.futures import ProcessPoolExecutor
 
 PROBS = {
 
@@ -37,53 +40,75 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Default budget for approximate inference
+SAMPLES = 20000
+CHAINS = 4
+BATCHES = 20
+
+# People whose gene counts split the sharded enumeration, 3 ** n ways
+SPLIT_PEOPLE = 3
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv [--workers N] [--log-space] "
+              "[--method METHOD] [--samples N] [--chains N] [--seed N]"
+    )
+    parser.add_argument("data")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="split the enumeration across N processes"
+    )
+    parser.add_argument(
+        "--log-space", action="store_true",
+        help="accumulate log-probabilities to avoid underflow"
+    )
+    parser.add_argument(
+        "--method", choices=["exact", "gibbs", "weighting"], default="exact",
+        help="exact enumeration, Gibbs sampling or likelihood weighting"
+    )
+    parser.add_argument(
+        "--samples", type=int, default=SAMPLES,
+        help="total sample budget for approximate inference"
+    )
+    parser.add_argument(
+        "--chains", type=int, default=CHAINS,
+        help="number of independent chains for approximate inference"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    if args.method != "exact":
+        probabilities, errors, diagnostics = approximate_probabilities(
+            people, args.method, args.samples, args.chains,
+            args.workers, args.seed
+        )
+        for person in people:
+            print(f"{person}:")
+            for field in probabilities[person]:
+                print(f"  {field.capitalize()}:")
+                for value in probabilities[person][field]:
+                    p = probabilities[person][field][value]
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+        print(f"Samples: {diagnostics['samples']}, "
+              f"R-hat: {diagnostics['r_hat']:.4f}, "
+              f"ESS: {diagnostics['ess']:.0f}")
+        return
 
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
-
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
+    if args.workers is not None:
+        probabilities = sharded_probabilities(
+            people, args.workers, args.log_space
         )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    else:
+        probabilities = enumerate_probabilities(people, args.log_space)
 
     # Ensure probabilities sum to 1
-    normalize(probabilities)
+    normalize(probabilities, args.log_space)
 
     # Print results
     for person in people:
@@ -129,6 +154,427 @@ def powerset(s):
     ]
 
 
+def empty_probabilities(people, log_space=False):
+    """
+    Return a probability table for `people` with every entry set to 0
+    (or to log(0) = -inf if `log_space` is True).
+    """
+    zero = -math.inf if log_space else 0
+    return {
+        person: {
+            "gene": {
+                2: zero,
+                1: zero,
+                0: zero
+            },
+            "trait": {
+                True: zero,
+                False: zero
+            }
+        }
+        for person in people
+    }
+
+
+def fails_evidence(people, have_trait):
+    """
+    Return True if set `have_trait` contradicts a known trait in `people`.
+    """
+    return any(
+        (people[person]["trait"] is not None and
+         people[person]["trait"] != (person in have_trait))
+        for person in people
+    )
+
+
+def enumerate_probabilities(people, log_space=False):
+    """
+    Return the unnormalized gene and trait probabilities of `people`,
+    summing the joint probability of every possible assignment.
+    If `log_space` is True, the table holds log-probabilities instead.
+    """
+    probabilities = empty_probabilities(people, log_space)
+    probability = log_joint_probability if log_space else joint_probability
+
+    # Loop over all sets of people who might have the trait
+    names = set(people)
+    for have_trait in powerset(names):
+
+        # Check if current set of people violates known information
+        if fails_evidence(people, have_trait):
+            continue
+
+        # Loop over all sets of people who might have the gene
+        for one_gene in powerset(names):
+            for two_genes in powerset(names - one_gene):
+
+                # Update probabilities with new joint probability
+                p = probability(people, one_gene, two_genes, have_trait)
+                update(probabilities, one_gene, two_genes, have_trait, p,
+                       log_space)
+
+    return probabilities
+
+
+def trait_shards(people):
+    """
+    Return, in a fixed order, every set of people who might have the trait
+    without violating known information. Each set is one independent shard
+    of the enumeration.
+    """
+    return [
+        have_trait for have_trait in powerset(sorted(people))
+        if not fails_evidence(people, have_trait)
+    ]
+
+
+def shards(people):
+    """
+    Return, in a fixed order, the independent shards of the enumeration:
+    each trait shard split further by the gene counts of the first
+    `SPLIT_PEOPLE` people in sorted order. A shard is a set of people with
+    the trait and a tuple of (name, gene count) pairs.
+    """
+    names = sorted(people)[:SPLIT_PEOPLE]
+    return [
+        (have_trait, tuple(zip(names, genes)))
+        for have_trait in trait_shards(people)
+        for genes in itertools.product(range(3), repeat=len(names))
+    ]
+
+
+def enumerate_shard(people, shard, log_space=False):
+    """
+    Return the unnormalized probabilities contributed by every gene
+    assignment in `shard`: exactly the people in its set have the trait,
+    and the people it names have the given gene counts. Names are visited
+    in sorted order, so the result does not depend on the process (or hash
+    seed) computing it.
+    """
+    have_trait, genes = shard
+    fixed_one = {name for name, count in genes if count == 1}
+    fixed_two = {name for name, count in genes if count == 2}
+    fixed = {name for name, _ in genes}
+
+    probabilities = empty_probabilities(people, log_space)
+    probability = log_joint_probability if log_space else joint_probability
+    names = [name for name in sorted(people) if name not in fixed]
+    for one_gene in powerset(names):
+        rest = [name for name in names if name not in one_gene]
+        for two_genes in powerset(rest):
+            ones, twos = fixed_one | one_gene, fixed_two | two_genes
+            p = probability(people, ones, twos, have_trait)
+            update(probabilities, ones, twos, have_trait, p, log_space)
+    return probabilities
+
+
+def merge(probabilities, other, log_space=False):
+    """
+    Add every entry of probability table `other` into `probabilities`.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                if log_space:
+                    probabilities[person][field][value] = log_add(
+                        probabilities[person][field][value],
+                        other[person][field][value]
+                    )
+                else:
+                    probabilities[person][field][value] += other[person][field][value]
+
+
+def sharded_probabilities(people, workers, log_space=False):
+    """
+    Return the unnormalized probabilities of `people`, computing each
+    shard on a pool of `workers` processes.
+
+    Shard tables are always reduced in shard order, so the result is
+    bit-for-bit identical for any number of workers.
+    """
+    work = shards(people)
+    probabilities = empty_probabilities(people, log_space)
+
+    if workers <= 1:
+        tables = map(
+            enumerate_shard, itertools.repeat(people), work,
+            itertools.repeat(log_space)
+        )
+        for table in tables:
+            merge(probabilities, table, log_space)
+        return probabilities
+
+    chunksize = max(1, len(work) // (workers * 4))
+    with ProcessPoolExecutor(workers) as executor:
+        tables = executor.map(
+            enumerate_shard, itertools.repeat(people), work,
+            itertools.repeat(log_space), chunksize=chunksize
+        )
+        for table in tables:
+            merge(probabilities, table, log_space)
+    return probabilities
+
+
+def pedigree_order(people):
+    """
+    Return the names in `people` ordered so that parents come before
+    their children (ties broken alphabetically).
+    """
+    order = []
+    visited = set()
+    for name in sorted(people):
+        stack = [(name, False)]
+        while stack:
+            person, expanded = stack.pop()
+            if expanded:
+                order.append(person)
+                continue
+            if person in visited:
+                continue
+            visited.add(person)
+            stack.append((person, True))
+            for parent in sorted(get_parents(person, people), reverse=True):
+                if parent not in visited:
+                    stack.append((parent, False))
+    return order
+
+
+def gene_distribution(person, people, genes):
+    """
+    Return the probabilities of `person` having 0, 1 and 2 copies of the
+    gene, given the number of copies each parent has in dictionary `genes`.
+    """
+    if not get_parents(person, people):
+        return [PROBS["gene"][0], PROBS["gene"][1], PROBS["gene"][2]]
+
+    passed = {0: PROBS["mutation"], 1: 0.5, 2: 1 - PROBS["mutation"]}
+    mother = passed[genes[people[person]["mother"]]]
+    father = passed[genes[people[person]["father"]]]
+    return [
+        (1 - mother) * (1 - father),
+        (1 - mother) * father + mother * (1 - father),
+        mother * father
+    ]
+
+
+def sample_trait(person, people, genes, rng):
+    """
+    Return the observed trait of `person`, or sample one given their genes.
+    """
+    trait = people[person]["trait"]
+    if trait is not None:
+        return trait
+    return rng.random() < PROBS["trait"][genes[person]][True]
+
+
+def batch_estimate(people, records, log_weights):
+    """
+    Return the weighted, normalized probability table of a batch of
+    sampled (genes, traits) `records`, together with the log of the total
+    weight of the batch.
+    """
+    largest = max(log_weights)
+    weights = [math.exp(w - largest) for w in log_weights]
+    total = sum(weights)
+
+    estimate = empty_probabilities(people)
+    for (genes, traits), weight in zip(records, weights):
+        for person in people:
+            estimate[person]["gene"][genes[person]] += weight / total
+            estimate[person]["trait"][traits[person]] += weight / total
+    return estimate, largest + math.log(total)
+
+
+def weighting_chain(people, samples, seed):
+    """
+    Run likelihood weighting for `samples` samples with random `seed`.
+
+    Genes and unobserved traits are sampled from the model in pedigree
+    order; each sample is weighted by the likelihood of the observed traits.
+    Return a list of `BATCHES` batch estimates (see `batch_estimate`).
+    """
+    rng = random.Random(seed)
+    order = pedigree_order(people)
+    size = max(1, samples // BATCHES)
+
+    batches = []
+    for _ in range(BATCHES):
+        records = []
+        log_weights = []
+        for _ in range(size):
+            genes = dict()
+            log_weight = 0.0
+            for person in order:
+                distribution = gene_distribution(person, people, genes)
+                genes[person] = rng.choices((0, 1, 2), distribution)[0]
+                trait = people[person]["trait"]
+                if trait is not None:
+                    log_weight += math.log(PROBS["trait"][genes[person]][trait])
+            traits = {
+                person: sample_trait(person, people, genes, rng)
+                for person in order
+            }
+            records.append((genes, traits))
+            log_weights.append(log_weight)
+        batches.append(batch_estimate(people, records, log_weights))
+    return batches
+
+
+def gibbs_chain(people, samples, seed):
+    """
+    Run a Gibbs sampler for `samples` sweeps with random `seed`.
+
+    Each sweep resamples every person's genes from their distribution given
+    their Markov blanket (parents, children and co-parents, and their own
+    observed trait). The first tenth of the budget is discarded as burn-in.
+    Return a list of `BATCHES` batch estimates (see `batch_estimate`).
+    """
+    rng = random.Random(seed)
+    order = pedigree_order(people)
+    size = max(1, samples // BATCHES)
+
+    children = {person: [] for person in people}
+    for person in people:
+        for parent in get_parents(person, people):
+            children[parent].append(person)
+
+    # Start from a sample of the prior
+    genes = dict()
+    for person in order:
+        distribution = gene_distribution(person, people, genes)
+        genes[person] = rng.choices((0, 1, 2), distribution)[0]
+
+    def sweep():
+        for person in order:
+            prior = gene_distribution(person, people, genes)
+            trait = people[person]["trait"]
+            weights = []
+            for value in (0, 1, 2):
+                genes[person] = value
+                weight = prior[value]
+                if trait is not None:
+                    weight *= PROBS["trait"][value][trait]
+                for child in children[person]:
+                    weight *= gene_distribution(child, people, genes)[genes[child]]
+                weights.append(weight)
+            genes[person] = rng.choices((0, 1, 2), weights)[0]
+
+    for _ in range(samples // 10):
+        sweep()
+
+    batches = []
+    for _ in range(BATCHES):
+        records = []
+        for _ in range(size):
+            sweep()
+            traits = {
+                person: sample_trait(person, people, genes, rng)
+                for person in order
+            }
+            records.append((dict(genes), traits))
+        batches.append(batch_estimate(people, records, [0.0] * size))
+    return batches
+
+
+def approximate_probabilities(people, method="gibbs", samples=SAMPLES,
+                              chains=CHAINS, workers=None, seed=0):
+    """
+    Estimate the gene and trait probabilities of `people` by sampling.
+
+    `method` is either "gibbs" or "weighting" (likelihood weighting). The
+    `samples` budget is split across `chains` independent chains, seeded
+    `seed`, `seed + 1`, ..., which run on `workers` processes.
+
+    Return a tuple (probabilities, errors, diagnostics): normalized
+    probabilities, their standard errors (both in the same format as
+    `empty_probabilities`), and a dictionary with the total number of
+    samples, the largest Gelman-Rubin R-hat and the smallest effective
+    sample size across all entries.
+    """
+    samplers = {"gibbs": gibbs_chain, "weighting": weighting_chain}
+    if method not in samplers:
+        raise ValueError(f"unknown inference method {method}")
+    sampler = samplers[method]
+
+    per_chain = max(BATCHES, samples // chains)
+    seeds = [seed + chain for chain in range(chains)]
+    if workers is not None and workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            runs = list(executor.map(
+                sampler, itertools.repeat(people),
+                itertools.repeat(per_chain), seeds
+            ))
+    else:
+        runs = list(map(
+            sampler, itertools.repeat(people),
+            itertools.repeat(per_chain), seeds
+        ))
+
+    # Weight each batch by its share of the total likelihood weight
+    batches = [batch for run in runs for batch in run]
+    largest = max(log_weight for _, log_weight in batches)
+    weights = [math.exp(log_weight - largest) for _, log_weight in batches]
+    weights = [weight / sum(weights) for weight in weights]
+    count = len(batches)
+
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    r_hat = 1.0
+    ess = math.inf
+    for person in people:
+        for field in probabilities[person]:
+            for value in probabilities[person][field]:
+                values = [estimate[person][field][value]
+                          for estimate, _ in batches]
+                mean = sum(w * v for w, v in zip(weights, values))
+
+                # Rounding can push a certain value just past 0 or 1
+                mean = min(1.0, max(0.0, mean))
+
+                # Standard error from the spread of the batch estimates
+                variance = count / (count - 1) * sum(
+                    (w * (v - mean)) ** 2 for w, v in zip(weights, values)
+                )
+                probabilities[person][field][value] = mean
+                errors[person][field][value] = math.sqrt(variance)
+                if variance > 0 and 0 < mean < 1:
+                    ess = min(ess, mean * (1 - mean) / variance)
+
+                # Compare variance between and within chains
+                if len(runs) > 1:
+                    chain_values = [
+                        [estimate[person][field][value] for estimate, _ in run]
+                        for run in runs
+                    ]
+                    r_hat = max(r_hat, gelman_rubin(chain_values))
+
+    diagnostics = {
+        "samples": per_chain * len(runs),
+        "r_hat": r_hat,
+        "ess": ess if ess != math.inf else per_chain * len(runs)
+    }
+    return probabilities, errors, diagnostics
+
+
+def gelman_rubin(chains):
+    """
+    Return the Gelman-Rubin potential scale reduction factor of `chains`,
+    a list of equal-length lists of draws (here, batch estimates).
+    """
+    n = len(chains[0])
+    means = [sum(chain) / n for chain in chains]
+    grand = sum(means) / len(means)
+    between = n * sum((m - grand) ** 2 for m in means) / (len(chains) - 1)
+    within = sum(
+        sum((x - m) ** 2 for x in chain) / (n - 1)
+        for chain, m in zip(chains, means)
+    ) / len(chains)
+    if within == 0:
+        return 1.0
+    pooled = (n - 1) / n * within + between / n
+    return math.sqrt(pooled / within)
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -187,6 +633,68 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     return probability
 
 
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural log of `joint_probability`.
+
+    Factors are added as logs rather than multiplied, so the result stays
+    finite for pedigrees whose joint probability underflows a float.
+    """
+    log_probability = 0.0
+
+    for person in people:
+        if person in two_genes:
+            genes = 2
+        elif person in one_gene:
+            genes = 1
+        else:
+            genes = 0
+
+        parents = get_parents(person, people)
+        if not parents:
+            log_probability += math.log(PROBS["gene"][genes])
+        else:
+            mother, father = (
+                get_gene_from_parent(parent, one_gene, two_genes)
+                for parent in parents
+            )
+            if genes == 2:
+                inherited = mother * father
+            elif genes == 1:
+                inherited = (1 - mother) * father + mother * (1 - father)
+            else:
+                inherited = (1 - mother) * (1 - father)
+            log_probability += math.log(inherited)
+
+        log_probability += math.log(PROBS["trait"][genes][person in have_trait])
+
+    return log_probability
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def log_sum_exp(values):
+    """
+    Return log(sum(exp(v) for v in values)) without leaving log space.
+    """
+    values = list(values)
+    largest = max(values)
+    if largest == -math.inf:
+        return largest
+    return largest + math.log(sum(math.exp(v - largest) for v in values))
+
+
 def get_parents(person, people):
     """
     Returns a set containing the name of the parents of the given 'person'.
@@ -228,12 +736,14 @@ def get_gene_from_parent(parent, one_gene, two_genes):
         return PROBS["mutation"]
 
 
-def update(probabilities, one_gene, two_genes, have_trait, p):
+def update(probabilities, one_gene, two_genes, have_trait, p,
+           log_space=False):
     """
     Add to `probabilities` a new joint probability `p`.
     Each person should have their "gene" and "trait" distributions updated.
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
+    If `log_space` is True, both `p` and the table hold log-probabilities.
     """
     for person in probabilities:
         # Genes
@@ -250,17 +760,35 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         else:
             trait = False
 
+        if log_space:
+            gene = probabilities[person]["gene"]
+            gene[genes] = log_add(gene[genes], p)
+            traits = probabilities[person]["trait"]
+            traits[trait] = log_add(traits[trait], p)
+            continue
+
         probabilities[person]["gene"][genes] += p 
         probabilities[person]["trait"][trait] += p 
 
         
 
 
-def normalize(probabilities):
+def normalize(probabilities, log_space=False):
     """
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
+    If `log_space` is True, `probabilities` holds log-probabilities, which
+    are replaced by the normalized (linear) probabilities.
     """
+    if log_space:
+        for person in probabilities:
+            for field in probabilities[person]:
+                distribution = probabilities[person][field]
+                total = log_sum_exp(distribution.values())
+                for key in distribution:
+                    distribution[key] = math.exp(distribution[key] - total)
+        return
+
     probabilities_copy = copy.deepcopy(probabilities)
 
     for person in probabilities_copy:
@@ -0,0 +1,287 @@
+"""
+Knowledge compilation of logical sentences to reduced ordered binary
+decision diagrams (BDDs).
+
+A BDD represents a sentence as a graph of decision nodes over a fixed order
+of its symbols: each node tests one symbol and points to the node for when
+it is false (low) and for when it is true (high). Nodes are hash-consed
+through a unique table, so equivalent sentences compile to the same node,
+and combining two diagrams goes through a memoized apply cache.
+
+Compiling can be expensive, but once a knowledge base is compiled,
+entailment, model counting and conditioning only walk the diagram instead
+of searching the space of models again.
+
+Nodes are integers: FALSE and TRUE are the two terminals.
+"""
+
+import math
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+FALSE = 0
+TRUE = 1
+
+
+class BDD():
+    """A shared table of BDD nodes over an order of symbols."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.order = dict()
+        self.levels = [math.inf, math.inf]
+        self.lows = [FALSE, TRUE]
+        self.highs = [FALSE, TRUE]
+        self.unique = dict()
+        self.cache = dict()
+        self.compiled = dict()
+        for name in names:
+            self.variable(name)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def variable(self, name):
+        """Returns the level of a symbol, appending it to the order if new."""
+        if name not in self.order:
+            self.order[name] = len(self.names)
+            self.names.append(name)
+        return self.order[name]
+
+    def node(self, level, low, high):
+        """Returns the unique reduced node testing `level`."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        if key not in self.unique:
+            self.unique[key] = len(self.levels)
+            self.levels.append(level)
+            self.lows.append(low)
+            self.highs.append(high)
+        return self.unique[key]
+
+    def symbol(self, name):
+        """Returns the node of a single symbol."""
+        return self.node(self.variable(name), FALSE, TRUE)
+
+    def apply(self, op, u, v):
+        """
+        Returns the node of `u op v`, where op is "and", "or" or "xor".
+        Uses an explicit stack, so deep diagrams do not hit the recursion
+        limit.
+        """
+        results = []
+        stack = [(u, v, False)]
+        while stack:
+            u, v, expanded = stack.pop()
+            if u > v:
+                u, v = v, u
+            key = (op, u, v)
+            level = min(self.levels[u], self.levels[v])
+
+            if expanded:
+                high = results.pop()
+                low = results.pop()
+                result = self.node(level, low, high)
+                self.cache[key] = result
+                results.append(result)
+                continue
+
+            result = self.terminal(op, u, v)
+            if result is None:
+                result = self.cache.get(key)
+            if result is not None:
+                results.append(result)
+                continue
+
+            # Split both operands on the topmost symbol tested by either
+            u0, u1 = self.branches(u, level)
+            v0, v1 = self.branches(v, level)
+            stack.append((u, v, True))
+            stack.append((u1, v1, False))
+            stack.append((u0, v0, False))
+        return results.pop()
+
+    def terminal(self, op, u, v):
+        """
+        Returns the result of `u op v` when it follows without splitting,
+        given u <= v, or None.
+        """
+        if op == "and":
+            if u == FALSE or u == v:
+                return u
+            if u == TRUE:
+                return v
+        elif op == "or":
+            if u == TRUE or v == TRUE:
+                return TRUE
+            if u == FALSE or u == v:
+                return v
+        else:
+            if u == v:
+                return FALSE
+            if u == FALSE:
+                return v
+        return None
+
+    def branches(self, u, level):
+        """Returns the low and high cofactors of a node at `level`."""
+        if self.levels[u] == level:
+            return self.lows[u], self.highs[u]
+        return u, u
+
+    def negate(self, u):
+        """Returns the node of the negation of `u`."""
+        return self.apply("xor", u, TRUE)
+
+    def compile(self, sentence):
+        """Returns the node equivalent to a sentence."""
+        root = sentence
+        stack = [(sentence, False)]
+        while stack:
+            sentence, expanded = stack.pop()
+            if sentence in self.compiled:
+                continue
+
+            if isinstance(sentence, Symbol):
+                self.compiled[sentence] = self.symbol(sentence.name)
+                continue
+            if isinstance(sentence, Not):
+                operands = [sentence.operand]
+            elif isinstance(sentence, And):
+                operands = list(sentence.conjuncts)
+            elif isinstance(sentence, Or):
+                operands = list(sentence.disjuncts)
+            elif isinstance(sentence, Implication):
+                operands = [sentence.antecedent, sentence.consequent]
+            elif isinstance(sentence, Biconditional):
+                operands = [sentence.left, sentence.right]
+            else:
+                raise TypeError("must be a logical sentence")
+
+            # Compile the operands first, leftmost on top of the stack
+            if not expanded:
+                stack.append((sentence, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+
+            # Combine operands last to first: later operands tend to test
+            # symbols lower in the order, so each step adds nodes on top
+            nodes = [self.compiled[operand] for operand in operands]
+            if isinstance(sentence, Not):
+                result = self.negate(nodes[0])
+            elif isinstance(sentence, And):
+                result = TRUE
+                for node in reversed(nodes):
+                    result = self.apply("and", result, node)
+            elif isinstance(sentence, Or):
+                result = FALSE
+                for node in reversed(nodes):
+                    result = self.apply("or", result, node)
+            elif isinstance(sentence, Implication):
+                result = self.apply("or", self.negate(nodes[0]), nodes[1])
+            else:
+                result = self.negate(self.apply("xor", nodes[0], nodes[1]))
+            self.compiled[sentence] = result
+        return self.compiled[root]
+
+    def reachable(self, u):
+        """
+        Returns the decision nodes reachable from `u`, children before
+        parents.
+        """
+        seen = set()
+        stack = [u]
+        while stack:
+            w = stack.pop()
+            if w in seen or w == FALSE or w == TRUE:
+                continue
+            seen.add(w)
+            stack.append(self.lows[w])
+            stack.append(self.highs[w])
+        return sorted(seen, key=lambda w: self.levels[w], reverse=True)
+
+    def condition(self, u, model):
+        """
+        Returns the node of `u` with the symbols in `model` (a dictionary
+        from symbol name to truth value) fixed to their values.
+        """
+        fixed = {self.order[name]: bool(value)
+                 for name, value in model.items() if name in self.order}
+        results = {FALSE: FALSE, TRUE: TRUE}
+        for w in self.reachable(u):
+            level = self.levels[w]
+            low, high = results[self.lows[w]], results[self.highs[w]]
+            if level in fixed:
+                results[w] = high if fixed[level] else low
+            else:
+                results[w] = self.node(level, low, high)
+        return results[u]
+
+    def entails(self, u, v):
+        """Checks if every model of `u` is a model of `v`."""
+        return self.apply("and", u, self.negate(v)) == FALSE
+
+    def count(self, u):
+        """Returns the number of models of `u` over every symbol in the order."""
+        size = len(self.names)
+
+        def level(w):
+            return size if w == FALSE or w == TRUE else self.levels[w]
+
+        # Models over the symbols from each node's level down
+        counts = {FALSE: 0, TRUE: 1}
+        for w in self.reachable(u):
+            counts[w] = sum(
+                counts[child] << (level(child) - level(w) - 1)
+                for child in (self.lows[w], self.highs[w])
+            )
+        return counts[u] << level(u)
+
+    def satisfy(self, u):
+        """
+        Returns a model of `u` (a dictionary from symbol name to truth
+        value, omitting symbols it does not depend on), or None if it has
+        none.
+        """
+        if u == FALSE:
+            return None
+        model = dict()
+        while u != TRUE:
+            name = self.names[self.levels[u]]
+            model[name] = self.highs[u] != FALSE
+            u = self.highs[u] if model[name] else self.lows[u]
+        return model
+
+    def evaluate(self, u, model):
+        """Evaluates `u` in a model assigning every symbol it depends on."""
+        while u != FALSE and u != TRUE:
+            name = self.names[self.levels[u]]
+            if name not in model:
+                raise Exception(f"variable {name} not in model")
+            u = self.highs[u] if model[name] else self.lows[u]
+        return u == TRUE
+
+
+def model_check(knowledge, query):
+    """Checks if knowledge base entails query, by compiling both to BDDs."""
+    bdd = BDD()
+    return bdd.entails(bdd.compile(knowledge), bdd.compile(query))
+
+
+def entailed_literals(knowledge, candidates):
+    """
+    Returns a list with each candidate that the knowledge base entails and
+    the negation of each candidate that it refutes, in candidate order.
+    The knowledge base is compiled once and shared by every query.
+    """
+    bdd = BDD()
+    compiled = bdd.compile(knowledge)
+    result = []
+    for candidate in candidates:
+        node = bdd.compile(candidate)
+        if bdd.entails(compiled, node):
+            result.append(candidate)
+        elif bdd.entails(compiled, bdd.negate(node)):
+            result.append(Not(candidate))
+    return result
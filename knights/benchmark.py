@@ -0,0 +1,203 @@
+import argparse
+import json
+import random
+import string
+import time
+
+import bdd
+import logic
+import sat
+import truthtable
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Ratio of clauses to variables near which random 3-SAT is hardest
+PHASE_TRANSITION = 4.26
+
+# Largest number of symbols each backend is run on, None for no limit
+LIMITS = {
+    "enumeration": 16,
+    "truthtable": 24,
+    "sat": None,
+    "bdd": 30
+}
+
+# How each backend's agreement with the others is printed
+AGREEMENT = {True: "yes", False: "NO", None: "-"}
+
+BACKENDS = {
+    "enumeration": logic.model_check,
+    "truthtable": truthtable.model_check,
+    "sat": sat.model_check,
+    "bdd": bdd.model_check
+}
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--speakers N ...] [--depth N] "
+              "[--variables N ...] [--ratio R] [--instances N] [--seed N] "
+              "[--output FILE]"
+    )
+    parser.add_argument(
+        "--speakers", type=int, nargs="+", default=[3, 5, 8, 12],
+        help="number of speakers in each generated knights-and-knaves puzzle"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=3,
+        help="maximum nesting depth of each speaker's statement"
+    )
+    parser.add_argument(
+        "--variables", type=int, nargs="+", default=[10, 16, 24, 40, 80],
+        help="number of variables in each generated 3-SAT instance"
+    )
+    parser.add_argument(
+        "--ratio", type=float, default=PHASE_TRANSITION,
+        help="ratio of clauses to variables in the 3-SAT instances"
+    )
+    parser.add_argument(
+        "--instances", type=int, default=3,
+        help="number of instances generated for each size"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="file to write JSON results to"
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    instances = []
+    for speakers in args.speakers:
+        for _ in range(args.instances):
+            knowledge, queries = generate_puzzle(speakers, args.depth, rng)
+            instances.append(("puzzle", speakers, knowledge, queries))
+    for variables in args.variables:
+        for _ in range(args.instances):
+            knowledge, queries = generate_3sat(variables, args.ratio, rng)
+            instances.append(("3sat", variables, knowledge, queries))
+
+    results = []
+    print(f"{'kind':<7} {'size':>5} {'symbols':>7} {'backend':<12} "
+          f"{'seconds':>10} {'agrees':>6}")
+    for kind, size, knowledge, queries in instances:
+        for result in compare(knowledge, queries):
+            result["kind"] = kind
+            result["size"] = size
+            results.append(result)
+            print(f"{kind:<7} {size:>5} {result['symbols']:>7} "
+                  f"{result['backend']:<12} {result['seconds']:>10.4f} "
+                  f"{AGREEMENT[result['agrees']]:>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def speaker_names(count):
+    """Return `count` speaker names: A to Z, then A1, B1, ..."""
+    letters = string.ascii_uppercase
+    return [letters[i % 26] + (str(i // 26) if i >= 26 else "")
+            for i in range(count)]
+
+
+def generate_statement(atoms, depth, rng):
+    """
+    Return a random sentence over `atoms`, nested at most `depth` levels.
+    """
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(atoms)
+    kind = rng.choice([Not, And, Or, Implication, Biconditional])
+    if kind == Not:
+        return Not(generate_statement(atoms, depth - 1, rng))
+    if kind in (And, Or):
+        return kind(*[generate_statement(atoms, depth - 1, rng)
+                      for _ in range(rng.randint(2, 3))])
+    return kind(generate_statement(atoms, depth - 1, rng),
+                generate_statement(atoms, depth - 1, rng))
+
+
+def generate_puzzle(speakers, depth, rng):
+    """
+    Return the knowledge base of a random, consistent knights-and-knaves
+    puzzle with `speakers` speakers, and the queries that solve it (whether
+    each speaker is a knight, and whether each is a knave).
+
+    Every speaker is either a knight or a knave, and says one statement
+    about the others (or themselves): true if they are a knight, false if
+    they are a knave.
+    """
+    names = speaker_names(speakers)
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    while True:
+        knowledge = []
+        for knight, knave in zip(knights, knaves):
+            knowledge.append(And(Or(knight, knave), Not(And(knight, knave))))
+        for knight, knave in zip(knights, knaves):
+            statement = generate_statement(knights + knaves, depth, rng)
+            knowledge.append(Implication(knight, statement))
+            knowledge.append(Implication(knave, Not(statement)))
+        knowledge = And(*knowledge)
+        if sat.satisfiable(knowledge) is not None:
+            return knowledge, knights + knaves
+
+
+def generate_3sat(variables, ratio, rng):
+    """
+    Return a random 3-SAT knowledge base with `variables` variables and
+    about `ratio` clauses per variable, and queries on its first variable.
+    """
+    symbols = [Symbol(f"x{i}") for i in range(variables)]
+    clauses = []
+    for _ in range(round(ratio * variables)):
+        clauses.append(Or(*[
+            symbol if rng.random() < 0.5 else Not(symbol)
+            for symbol in rng.sample(symbols, 3)
+        ]))
+    return And(*clauses), [symbols[0], Not(symbols[0])]
+
+
+def measure(backend, knowledge, queries):
+    """
+    Run `backend` on every query and return (answers, seconds).
+    """
+    start = time.perf_counter()
+    answers = [backend(knowledge, query) for query in queries]
+    return answers, time.perf_counter() - start
+
+
+def compare(knowledge, queries):
+    """
+    Run every backend whose symbol limit allows it on `queries` and return
+    a list of result dictionaries, checking that each backend's answers
+    agree with those of every other backend run. Agreement is None when
+    only one backend could run, as there is nothing to check it against.
+    """
+    symbols = len(set.union(knowledge.symbols(),
+                            *(query.symbols() for query in queries)))
+    results = []
+    answered = []
+    for name, backend in BACKENDS.items():
+        limit = LIMITS[name]
+        if limit is not None and symbols > limit:
+            continue
+        answers, seconds = measure(backend, knowledge, queries)
+        answered.append(answers)
+        results.append({
+            "backend": name,
+            "symbols": symbols,
+            "queries": len(queries),
+            "seconds": seconds,
+            "entailed": sum(answers)
+        })
+
+    for result, answers in zip(results, answered):
+        others = [other for other in answered if other is not answers]
+        result["agrees"] = (all(other == answers for other in others)
+                            if others else None)
+    return results
+
+
+if __name__ == "__main__":
+    main()
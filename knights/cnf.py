@@ -0,0 +1,129 @@
+"""
+Tseitin compilation of logical sentences to conjunctive normal form.
+
+Every compound subformula gets a fresh variable that is constrained to be
+equivalent to it, so the clause list grows linearly with the size of the
+sentence instead of exponentially. Subformulas are looked up by structure
+before being encoded, so a subformula shared between (or repeated within)
+sentences is only encoded once.
+
+Literals are integers in the DIMACS convention: variable v is the literal
+v and its negation is -v.
+"""
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class CNF():
+    """A growing set of clauses compiled from sentences."""
+
+    def __init__(self):
+        self.variables = dict()
+        self.clauses = []
+        self.count = 0
+        self.literals = dict()
+        self.true = None
+
+    def variable(self):
+        """Returns a fresh variable."""
+        self.count += 1
+        return self.count
+
+    def symbol(self, name):
+        """Returns the variable of the symbol with the given name."""
+        if name not in self.variables:
+            self.variables[name] = self.variable()
+        return self.variables[name]
+
+    def constant(self, value):
+        """Returns a literal that is always `value`."""
+        if self.true is None:
+            self.true = self.variable()
+            self.clauses.append([self.true])
+        return self.true if value else -self.true
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to the sentence, adding the clauses
+        that define it.
+        """
+        if isinstance(sentence, Symbol):
+            return self.symbol(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        if isinstance(sentence, (And, Or)):
+            operands = (sentence.conjuncts if isinstance(sentence, And)
+                        else sentence.disjuncts)
+            literals = [self.literal(operand) for operand in operands]
+            if not literals:
+                literal = self.constant(isinstance(sentence, And))
+            elif len(literals) == 1:
+                literal = literals[0]
+            elif isinstance(sentence, And):
+                literal = self.gate(literals)
+            else:
+                literal = -self.gate([-literal for literal in literals])
+
+        elif isinstance(sentence, Implication):
+            antecedent = self.literal(sentence.antecedent)
+            consequent = self.literal(sentence.consequent)
+            literal = -self.gate([antecedent, -consequent])
+
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            literal = self.variable()
+            self.clauses.extend([
+                [-literal, -left, right],
+                [-literal, left, -right],
+                [literal, left, right],
+                [literal, -left, -right]
+            ])
+
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[sentence] = literal
+        return literal
+
+    def gate(self, literals):
+        """Returns a fresh variable equivalent to the conjunction of literals."""
+        variable = self.variable()
+        for literal in literals:
+            self.clauses.append([-variable, literal])
+        self.clauses.append([variable] + [-literal for literal in literals])
+        return variable
+
+    def add(self, sentence):
+        """
+        Asserts the sentence. Top-level conjunctions and disjunctions are
+        added as clauses directly rather than through a fresh variable.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def dimacs(self):
+        """Returns the clauses in DIMACS CNF format."""
+        lines = [f"c {variable} {name}"
+                 for name, variable in self.variables.items()]
+        lines.append(f"p cnf {self.count} {len(self.clauses)}")
+        for clause in self.clauses:
+            lines.append(" ".join(str(literal) for literal in clause) + " 0")
+        return "\n".join(lines) + "\n"
+
+
+def to_cnf(sentence):
+    """Returns the Tseitin CNF of a sentence."""
+    cnf = CNF()
+    cnf.add(sentence)
+    return cnf
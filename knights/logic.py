@@ -1,11 +1,150 @@
 import itertools
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 
 class Sentence():
+    """
+    Sentences built only from symbols, Not, Or, Implication and
+    Biconditional are interned: constructing one that is structurally
+    equal to a live sentence returns the existing object. Each sentence
+    caches its hash, its set of symbols and, once it is evaluated, its
+    compiled Program.
+
+    Conjunctions are not interned, and neither is any sentence containing
+    one. A conjunction can grow in place with `add`, so sharing it would
+    let adding to one knowledge base change every equal one built
+    elsewhere. This covers every knowledge base in puzzle.py: equal
+    subformulas there are only shared when they contain no And. Sentences
+    containing a conjunction recompute their cached values when a
+    conjunction has changed since they were last used.
+    """
+
+    __slots__ = ("_hash", "_symbols", "_program", "_mutable", "_stamp",
+                 "__weakref__")
+
+    # Names of the slots holding a sentence's children, set by subclasses
+    _fields = ()
+
+    # Every live sentence that cannot change, keyed by class and children
+    _interned = weakref.WeakValueDictionary()
+
+    # Number of conjuncts added to conjunctions so far
+    _changes = 0
+
+    @staticmethod
+    def _intern(cls, values):
+        """Returns the sentence of class cls with the given children."""
+        sentence = object.__new__(cls)
+        for field, value in zip(cls._fields, values):
+            object.__setattr__(sentence, field, value)
+        mutable = cls is And or any(
+            child._mutable for child in sentence._children()
+        )
+        object.__setattr__(sentence, "_program", None)
+        object.__setattr__(sentence, "_mutable", mutable)
+        object.__setattr__(sentence, "_stamp", None)
+        if mutable:
+            sentence._refresh()
+            return sentence
+
+        key = (cls,) + values
+        existing = Sentence._interned.get(key)
+        if existing is not None:
+            return existing
+        sentence._update()
+        Sentence._interned[key] = sentence
+        return sentence
+
+    def _children(self):
+        """Returns the sentences directly inside this one."""
+        children = []
+        for value in self._values():
+            if isinstance(value, tuple):
+                children.extend(value)
+            elif isinstance(value, Sentence):
+                children.append(value)
+        return children
+
+    def _update(self):
+        """Recomputes the cached values from those of the children."""
+        children = self._children()
+        object.__setattr__(self, "_hash", hash(
+            (self._tag, tuple(child._hash for child in children))
+        ))
+        object.__setattr__(self, "_symbols", frozenset().union(
+            *[child._symbols for child in children]
+        ))
+
+    def _refresh(self):
+        """
+        Updates the cached values of this sentence and of every sentence
+        below it that is out of date, children first.
+        """
+        stamp = Sentence._changes
+        stack = [(self, False)]
+        while stack:
+            sentence, ready = stack.pop()
+            if sentence._stamp == stamp:
+                continue
+            if ready:
+                sentence._update()
+                object.__setattr__(sentence, "_program", None)
+                object.__setattr__(sentence, "_stamp", stamp)
+                continue
+            stack.append((sentence, True))
+            stack.extend((child, False) for child in sentence._children()
+                         if child._mutable and child._stamp != stamp)
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def _arguments(self):
+        """Returns the constructor arguments that rebuild the sentence."""
+        return self._values()
+
+    def __reduce__(self):
+        # Unpickling goes through the constructor, so it interns again
+        return (type(self), self._arguments())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("sentences are immutable")
+
+    def __eq__(self, other):
+        return self is other or (
+            type(self) is type(other)
+            and hash(self) == hash(other)
+            and self._values() == other._values()
+        )
+
+    def __hash__(self):
+        if self._mutable:
+            self._refresh()
+        return self._hash
+
+    def program(self):
+        """Returns the sentence compiled into a Program, compiling it once."""
+        if self._mutable:
+            self._refresh()
+        if self._program is None:
+            object.__setattr__(self, "_program", Program(self))
+        return self._program
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
-        raise Exception("nothing to evaluate")
+        return self.program().run(model)
+
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave some
+        symbols unassigned. Returns True or False if every completion of
+        the model agrees, and None otherwise.
+        """
+        return self.program().run(model, partial=True)
 
     def formula(self):
         """Returns string formula representing logical sentence."""
@@ -13,7 +152,9 @@ class Sentence():
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        if self._mutable:
+            self._refresh()
+        return set(self._symbols)
 
     @classmethod
     def validate(cls, sentence):
@@ -44,68 +185,53 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
+    _fields = ("name",)
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+    def __new__(cls, name):
+        return Sentence._intern(cls, (name,))
 
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def _update(self):
+        object.__setattr__(self, "_hash", hash(("symbol", self.name)))
+        object.__setattr__(self, "_symbols", frozenset([self.name]))
 
     def __repr__(self):
         return self.name
 
-    def evaluate(self, model):
-        try:
-            return bool(model[self.name])
-        except KeyError:
-            raise Exception(f"variable {self.name} not in model")
-
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
-
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    __slots__ = ("operand",)
+    _fields = ("operand",)
+    _tag = "not"
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return Sentence._intern(cls, (operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
 
-    def evaluate(self, model):
-        return not self.operand.evaluate(model)
-
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
-
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+
+    __slots__ = ("conjuncts",)
+    _fields = ("conjuncts",)
+    _tag = "and"
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return Sentence._intern(cls, (conjuncts,))
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def _arguments(self):
+        return self.conjuncts
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,11 +240,14 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        """
+        Adds a conjunct in place. This is the one operation that changes a
+        sentence: every sentence containing the conjunction sees the new
+        conjunct, and updates its cached values the next time it is used.
+        """
         Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
-
-    def evaluate(self, model):
-        return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
+        object.__setattr__(self, "conjuncts", self.conjuncts + (conjunct,))
+        Sentence._changes += 1
 
     def formula(self):
         if len(self.conjuncts) == 1:
@@ -126,138 +255,381 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
-
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+
+    __slots__ = ("disjuncts",)
+    _fields = ("disjuncts",)
+    _tag = "or"
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return Sentence._intern(cls, (disjuncts,))
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def _arguments(self):
+        return self.disjuncts
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
-    def evaluate(self, model):
-        return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
-
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
-
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
-        Sentence.validate(antecedent)
-        Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+    __slots__ = ("antecedent", "consequent")
+    _fields = ("antecedent", "consequent")
+    _tag = "implies"
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __new__(cls, antecedent, consequent):
+        Sentence.validate(antecedent)
+        Sentence.validate(consequent)
+        return Sentence._intern(cls, (antecedent, consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
-    def evaluate(self, model):
-        return ((not self.antecedent.evaluate(model))
-                or self.consequent.evaluate(model))
-
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
-
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
-        Sentence.validate(left)
-        Sentence.validate(right)
-        self.left = left
-        self.right = right
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+    __slots__ = ("left", "right")
+    _fields = ("left", "right")
+    _tag = "biconditional"
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __new__(cls, left, right):
+        Sentence.validate(left)
+        Sentence.validate(right)
+        return Sentence._intern(cls, (left, right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
-    def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
-
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+
+class Program():
+    """
+    A sentence compiled into a flat list of instructions, so it can be
+    evaluated by a loop instead of by recursion over the sentence tree.
+
+    Instructions leave the value of the subformula just evaluated in a
+    single register. Compound sentences keep their partial result on a
+    stack, and jump past their remaining operands once the result is
+    decided, so evaluation short-circuits like `all` and `any`.
+    """
+
+    (LOAD, CONSTANT, PUSH, POP, NOT, AND, OR,
+     IMPLIES, IMPLIES_THEN, IFF, IFF_THEN) = range(11)
+
+    def __init__(self, sentence):
+        self.code = []
+
+        # Pending work, popped last-in first-out: sentences to compile,
+        # instructions to emit, and jump targets to resolve
+        tasks = [("compile", sentence)]
+        while tasks:
+            task, argument = tasks.pop()
+            if task == "emit":
+                self.code.append(list(argument))
+            elif task == "jump":
+                op, jumps = argument
+                jumps.append(len(self.code))
+                self.code.append([op, None])
+            elif task == "label":
+                for jump in argument:
+                    self.code[jump][1] = len(self.code)
+            else:
+                tasks.extend(reversed(Program.expand(argument)))
+
+    @staticmethod
+    def expand(sentence):
+        """Returns the tasks that compile one sentence, in order."""
+        if isinstance(sentence, Symbol):
+            return [("emit", (Program.LOAD, sentence.name))]
+        if isinstance(sentence, Not):
+            return [("compile", sentence.operand),
+                    ("emit", (Program.NOT, None))]
+
+        jumps = []
+        if isinstance(sentence, (And, Or)):
+            conjunction = isinstance(sentence, And)
+            operands = sentence.conjuncts if conjunction else sentence.disjuncts
+            if not operands:
+                return [("emit", (Program.CONSTANT, conjunction))]
+            op = Program.AND if conjunction else Program.OR
+            tasks = [("emit", (Program.PUSH, conjunction))]
+            for operand in operands:
+                tasks.append(("compile", operand))
+                tasks.append(("jump", (op, jumps)))
+            return tasks + [("emit", (Program.POP, None)), ("label", jumps)]
+        if isinstance(sentence, Implication):
+            return [("emit", (Program.PUSH, None)),
+                    ("compile", sentence.antecedent),
+                    ("jump", (Program.IMPLIES, jumps)),
+                    ("compile", sentence.consequent),
+                    ("emit", (Program.IMPLIES_THEN, None)),
+                    ("label", jumps)]
+        if isinstance(sentence, Biconditional):
+            return [("emit", (Program.PUSH, None)),
+                    ("compile", sentence.left),
+                    ("jump", (Program.IFF, jumps)),
+                    ("compile", sentence.right),
+                    ("emit", (Program.IFF_THEN, None)),
+                    ("label", jumps)]
+        raise Exception("nothing to evaluate")
+
+    def run(self, model, partial=False):
+        """
+        Evaluates the program in a model. With `partial`, unassigned
+        symbols are unknown (None) instead of an error, and the result is
+        None unless every completion of the model agrees.
+        """
+        code = self.code
+        end = len(code)
+
+        # Opcodes as locals, which are faster to look up in the loop
+        LOAD, PUSH, POP = Program.LOAD, Program.PUSH, Program.POP
+        NOT, AND, OR = Program.NOT, Program.AND, Program.OR
+        IMPLIES, IMPLIES_THEN = Program.IMPLIES, Program.IMPLIES_THEN
+        IFF, IFF_THEN = Program.IFF, Program.IFF_THEN
+
+        stack = []
+        value = None
+        pc = 0
+        while pc < end:
+            op, argument = code[pc]
+            pc += 1
+            if op == LOAD:
+                if argument in model:
+                    value = bool(model[argument])
+                elif partial:
+                    value = None
+                else:
+                    raise Exception(f"variable {argument} not in model")
+            elif op == AND:
+                if value is False:
+                    stack.pop()
+                    pc = argument
+                elif value is None:
+                    stack[-1] = None
+            elif op == OR:
+                if value is True:
+                    stack.pop()
+                    pc = argument
+                elif value is None:
+                    stack[-1] = None
+            elif op == NOT:
+                if value is not None:
+                    value = not value
+            elif op == PUSH:
+                stack.append(argument)
+            elif op == POP:
+                value = stack.pop()
+            elif op == IMPLIES:
+                if value is False:
+                    stack.pop()
+                    value = True
+                    pc = argument
+                else:
+                    stack[-1] = value
+            elif op == IMPLIES_THEN:
+                antecedent = stack.pop()
+                if value is not True and (antecedent is None or value is None):
+                    value = None
+                else:
+                    value = value is True
+            elif op == IFF:
+                if value is None:
+                    stack.pop()
+                    pc = argument
+                else:
+                    stack[-1] = value
+            elif op == IFF_THEN:
+                left = stack.pop()
+                if value is not None:
+                    value = left == value
+            else:
+                value = argument
+        return value
+
+
+def search(symbols, model, visit, cancelled=None):
+    """
+    Walks the assignments of `symbols` depth first, trying true before
+    false. The model is extended in place and restored on return.
+
+    At each partial model, `visit(model)` returns None to assign the next
+    symbol, True to backtrack, or False to stop the search. A model that
+    assigns every symbol is a leaf, so None there backtracks too. Returns False
+    if the search was stopped, and True otherwise (including when the
+    `cancelled` event, if any, is set).
+    """
+    trail = []
+    while True:
+        if cancelled is not None and cancelled.is_set():
+            for p in trail:
+                del model[p]
+            return True
+
+        # Assign the next symbol, true first
+        outcome = visit(model)
+        if outcome is None and len(model) < len(symbols):
+            p = symbols[len(model)]
+            model[p] = True
+            trail.append(p)
+            continue
+
+        if outcome is False:
+            for p in trail:
+                del model[p]
+            return False
+
+        # Backtrack to the deepest symbol not yet tried as false
+        while trail and model[trail[-1]] is False:
+            del model[trail.pop()]
+        if not trail:
+            return True
+        model[trail[-1]] = False
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+def model_check(knowledge, query, workers=None):
+    """
+    Checks if knowledge base entails query.
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    With `workers` greater than 1, the first few symbols are fixed to each
+    of their combinations of values, and every resulting subtree is
+    checked by a pool of worker processes. All workers stop as soon as one
+    of them finds a model of the knowledge base where the query is false.
+    """
 
-        # If model has an assignment for each symbol
-        if not symbols:
+    # Get all symbols in both knowledge and query
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
+    # Check that knowledge entails query
+    if workers is None or workers <= 1:
+        return check_all(knowledge, query, symbols, dict())
+
+    # Split into about four subtrees per worker
+    bits = min(len(symbols), (4 * workers - 1).bit_length())
+    cancelled = multiprocessing.Event()
+    with ProcessPoolExecutor(
+        workers, initializer=start_worker, initargs=(cancelled,)
+    ) as executor:
+        futures = [
+            executor.submit(check_prefix, knowledge, query, symbols, values)
+            for values in itertools.product([True, False], repeat=bits)
+        ]
+        for future in as_completed(futures):
+            if not future.result():
+                cancelled.set()
+                for pending in futures:
+                    pending.cancel()
+                return False
+    return True
+
+
+def check_all(knowledge, query, symbols, model, cancelled=None):
+    """
+    Checks if knowledge base entails query in every completion of a
+    partial model, assigning the remaining symbols in order. Gives up
+    (returning True) once the `cancelled` event, if any, is set.
+    """
+    knowledge_program = knowledge.program()
+    query_program = query.program()
+
+    def visit(model):
+
+        # Prune as soon as the partial model decides the outcome
+        satisfied = knowledge_program.run(model, partial=True)
+        if satisfied is False:
             return True
-        else:
+        if satisfied is True:
+            return query_program.run(model, partial=True)
+        return None
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    return search(symbols, model, visit, cancelled)
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+# Cancellation event shared by the processes of a parallel model_check
+cancellation = None
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+def start_worker(cancelled):
+    """Initializes a model_check worker process."""
+    global cancellation
+    cancellation = cancelled
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+
+def check_prefix(knowledge, query, symbols, values):
+    """
+    Checks entailment in the subtree where the first symbols take the
+    given values (run in a worker process).
+    """
+    model = dict(zip(symbols, values))
+    return check_all(knowledge, query, symbols, model, cancellation)
+
+
+def entailed_literals(knowledge, candidates):
+    """
+    Checks every candidate against the knowledge base at once.
+
+    Returns a list with each candidate that the knowledge base entails and
+    the negation of each candidate that it refutes, in candidate order.
+    The models of the knowledge base are enumerated a single time, and
+    enumeration stops once no candidate can still be decided.
+    """
+    candidates = list(candidates)
+    symbols = sorted(set.union(
+        knowledge.symbols(), *[candidate.symbols() for candidate in candidates]
+    ))
+
+    knowledge_program = knowledge.program()
+    programs = [candidate.program() for candidate in candidates]
+
+    # Truth values each candidate takes across the models seen so far
+    seen = [set() for _ in candidates]
+    undecided = set(range(len(candidates)))
+
+    def visit(model):
+        """
+        Records the candidates' values once a partial model decides the
+        knowledge base and every undecided candidate. Stops the search
+        once nothing is left to decide.
+        """
+        satisfied = knowledge_program.run(model, partial=True)
+        if satisfied is False:
+            return True
+        if satisfied is True:
+            values = {i: programs[i].run(model, partial=True)
+                      for i in undecided}
+            if None not in values.values():
+                for i, value in values.items():
+                    seen[i].add(value)
+                    if len(seen[i]) == 2:
+                        undecided.remove(i)
+                return bool(undecided)
+        return None
+
+    search(symbols, dict(), visit)
+
+    literals = []
+    for candidate, values in zip(candidates, seen):
+        if False not in values:
+            literals.append(candidate)
+        elif True not in values:
+            literals.append(Not(candidate))
+    return literals
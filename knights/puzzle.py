@@ -86,8 +86,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            entailed = entailed_literals(knowledge, symbols)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if symbol in entailed:
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,424 @@
+"""
+SAT-backed entailment for the logic module.
+
+`model_check` decides whether knowledge entails query by asking whether
+knowledge ∧ ¬query is unsatisfiable. The sentence is compiled to clauses
+over integer literals by the Tseitin encoding in `cnf`, and `Solver`
+decides them with conflict-driven clause learning: unit propagation over
+two watched literals per clause, first-UIP clause learning with
+non-chronological backjumping, VSIDS variable activities and Luby
+restarts.
+
+`KnowledgeBase` keeps one solver alive while sentences are added and
+queried, so later queries reuse what earlier ones learned.
+"""
+
+import heapq
+
+from cnf import CNF, to_cnf
+from logic import And, Not
+
+# Conflicts per unit of the Luby restart sequence
+RESTART_BASE = 100
+
+# Multiplier applied to the VSIDS bump increment after every conflict
+ACTIVITY_DECAY = 0.95
+
+
+def luby(i):
+    """Returns element i (counting from 0) of the Luby sequence."""
+    size, power = 1, 0
+    while size < i + 1:
+        power += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        power -= 1
+        i = i % size
+    return 2 ** power
+
+
+class Solver():
+    """
+    A CDCL SAT solver over integer literals.
+
+    Clauses may be added between calls to `solve`; learned clauses are
+    kept, since they are implied by the clauses added so far.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.watches = dict()
+        self.values = [None]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.trail = []
+        self.limits = []
+        self.head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.ok = True
+
+    def ensure(self, variable):
+        """Makes room for variables up to `variable`."""
+        while len(self.values) <= variable:
+            self.values.append(None)
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            heapq.heappush(self.heap, (0.0, len(self.values) - 1))
+
+    def value(self, literal):
+        """Returns the truth value of a literal, or None if unassigned."""
+        value = self.values[abs(literal)]
+        if value is None:
+            return None
+        return value if literal > 0 else not value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause. Returns False if the clauses are now known to be
+        unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        clause = []
+        for literal in literals:
+            self.ensure(abs(literal))
+            if -literal in clause or self.value(literal) is True:
+                return True
+            if self.value(literal) is None and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause):
+        """Stores a clause, watching its first two literals."""
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches.setdefault(clause[0], []).append(index)
+        self.watches.setdefault(clause[1], []).append(index)
+        return index
+
+    def assign(self, literal, reason):
+        """Makes a literal true at the current decision level."""
+        variable = abs(literal)
+        self.values[variable] = literal > 0
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates every unit clause. Returns the index of a conflicting
+        clause, or None if there is no conflict.
+        """
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watchers = self.watches.get(false, [])
+            kept = []
+            conflict = None
+            i = 0
+            while i < len(watchers):
+                index = watchers[i]
+                i += 1
+                clause = self.clauses[index]
+
+                # Keep the falsified watch in position 1
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(index)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.value(clause[0]) is False:
+                        conflict = index
+                        kept.extend(watchers[i:])
+                        break
+                    self.assign(clause[0], index)
+            self.watches[false] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives the first-UIP clause from a conflict. Returns the learned
+        clause, asserting literal first, and the level to backjump to.
+        """
+        level = len(self.limits)
+        learned = [None]
+        seen = set()
+        counter = 0
+        literal = None
+        clause = self.clauses[conflict]
+        index = len(self.trail) - 1
+
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if other == literal or variable in seen:
+                    continue
+                if self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.levels[variable] == level:
+                    counter += 1
+                else:
+                    learned.append(other)
+
+            # Walk back to the next literal involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+
+        learned[0] = -literal
+
+        # Watch the literal from the highest remaining level second
+        back = 0
+        for k in range(1, len(learned)):
+            if self.levels[abs(learned[k])] > back:
+                back = self.levels[abs(learned[k])]
+                learned[1], learned[k] = learned[k], learned[1]
+        return learned, back
+
+    def bump(self, variable):
+        """Increases a variable's VSIDS activity."""
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.values))]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """Undoes every assignment above decision level `level`."""
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phase[variable] = self.values[variable]
+            self.values[variable] = None
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+
+    def pick(self):
+        """Returns the unassigned variable with the highest activity."""
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if (self.values[variable] is None
+                    and -activity == self.activity[variable]):
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Searches for an assignment satisfying every clause and making every
+        literal in `assumptions` true. Returns a dictionary mapping each
+        variable to its value, or None if there is no such assignment.
+        """
+        if not self.ok:
+            return None
+        self.backtrack(0)
+        for literal in assumptions:
+            self.ensure(abs(literal))
+
+        conflicts = 0
+        restarts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.limits:
+                    self.ok = False
+                    return None
+                learned, back = self.analyze(conflict)
+                self.backtrack(back)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.assign(learned[0], self.attach(learned))
+                self.increment /= ACTIVITY_DECAY
+                conflicts += 1
+                continue
+
+            # Restart on the Luby schedule, keeping learned clauses
+            if conflicts >= RESTART_BASE * luby(restarts):
+                conflicts = 0
+                restarts += 1
+                self.backtrack(0)
+                continue
+
+            # Decide assumptions first, one per decision level
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                if self.value(literal) is False:
+                    self.backtrack(0)
+                    return None
+                self.limits.append(len(self.trail))
+                if self.value(literal) is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.pick()
+            if variable is None:
+                model = {v: self.values[v] for v in range(1, len(self.values))}
+                self.backtrack(0)
+                return model
+            self.limits.append(len(self.trail))
+            self.assign(variable if self.phase[variable] else -variable, None)
+
+
+def satisfiable(sentence):
+    """
+    Returns a model (a dictionary from symbol name to truth value) in which
+    the sentence is true, or None if it is unsatisfiable.
+    """
+    cnf = to_cnf(sentence)
+    solver = Solver()
+    for clause in cnf.clauses:
+        solver.add_clause(clause)
+    model = solver.solve()
+    if model is None:
+        return None
+    return {name: model.get(variable, False)
+            for name, variable in cnf.variables.items()}
+
+
+def model_check(knowledge, query):
+    """Checks if knowledge base entails query, using a SAT solver."""
+    return satisfiable(And(knowledge, Not(query))) is None
+
+
+def entailed_literals(knowledge, candidates):
+    """
+    Returns a list with each candidate that the knowledge base entails and
+    the negation of each candidate that it refutes, in candidate order.
+    """
+    return KnowledgeBase(knowledge).entailed_literals(candidates)
+
+
+class KnowledgeBase():
+    """
+    A knowledge base that grows one sentence at a time.
+
+    Sentences are compiled to clauses as they are added and pushed into a
+    single solver, which keeps its learned clauses across additions and
+    queries. Queries are answered by solving under assumptions, so asking
+    about a sentence only adds the clauses defining it (once), never
+    restating the knowledge base.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.pushed = 0
+        self.sentences = []
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        self.sentences.append(sentence)
+        self.cnf.add(sentence)
+        self.push()
+
+    def push(self):
+        """Passes the clauses compiled since the last push to the solver."""
+        self.solver.ensure(self.cnf.count)
+        for clause in self.cnf.clauses[self.pushed:]:
+            self.solver.add_clause(clause)
+        self.pushed = len(self.cnf.clauses)
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to a sentence."""
+        literal = self.cnf.literal(sentence)
+        self.push()
+        return literal
+
+    def symbols(self):
+        """Returns the set of symbols in the knowledge base."""
+        return set().union(*(sentence.symbols() for sentence in self.sentences))
+
+    def model(self):
+        """
+        Returns a model (a dictionary from symbol name to truth value) of
+        the knowledge base, or None if it is unsatisfiable.
+        """
+        model = self.solver.solve()
+        if model is None:
+            return None
+        return {name: model.get(variable, False)
+                for name, variable in self.cnf.variables.items()}
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.solver.solve([-self.literal(query)]) is None
+
+    def entailed_literals(self, candidates):
+        """
+        Returns a list with each candidate that the knowledge base entails
+        and the negation of each candidate that it refutes, in candidate
+        order.
+
+        Computes the backbone of the candidates: every model found rules
+        out the candidates whose value differs between models, and each
+        remaining candidate costs one more solve with its opposite value
+        assumed.
+        """
+        candidates = list(candidates)
+        literals = [self.literal(candidate) for candidate in candidates]
+
+        model = self.solver.solve()
+        if model is None:
+            return candidates
+        models = [model]
+
+        def value(model, literal):
+            return model[abs(literal)] == (literal > 0)
+
+        result = []
+        for candidate, literal in zip(candidates, literals):
+            values = {value(model, literal) for model in models}
+            if len(values) == 2:
+                continue
+            true = values.pop()
+            model = self.solver.solve([-literal if true else literal])
+            if model is None:
+                result.append(candidate if true else Not(candidate))
+            else:
+                models.append(model)
+        return result
@@ -0,0 +1,118 @@
+"""
+Bit-parallel truth table evaluation of logical sentences.
+
+A block of 2^b models is packed into one Python integer, one bit per model.
+Within a block, the first b symbols take every combination of values: the
+mask of symbol i has bit m set exactly when bit i of m is set. The other
+symbols are fixed for the whole block, so their masks are all zeros or all
+ones. A sentence then evaluates a whole block at once with bitwise
+operations, and knowledge entails query exactly when knowledge & ~query is
+zero in every block.
+"""
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# Number of symbols enumerated within one integer (2^16 models per block)
+BLOCK_BITS = 16
+
+
+class Program():
+    """
+    Sentences compiled into a list of bitwise instructions, one register
+    per distinct subformula.
+    """
+
+    def __init__(self, sentences, names):
+        self.names = list(names)
+        self.instructions = []
+        self.registers = dict()
+        self.count = len(self.names)
+        for i, name in enumerate(self.names):
+            self.registers[Symbol(name)] = i
+        self.outputs = [self.register(sentence) for sentence in sentences]
+
+    def register(self, sentence):
+        """Returns the register holding the sentence, compiling it if needed."""
+        if sentence in self.registers:
+            return self.registers[sentence]
+
+        if isinstance(sentence, Not):
+            instruction = ("not", [self.register(sentence.operand)])
+        elif isinstance(sentence, And):
+            instruction = ("and", [self.register(c) for c in sentence.conjuncts])
+        elif isinstance(sentence, Or):
+            instruction = ("or", [self.register(d) for d in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            instruction = ("implies", [self.register(sentence.antecedent),
+                                       self.register(sentence.consequent)])
+        elif isinstance(sentence, Biconditional):
+            instruction = ("iff", [self.register(sentence.left),
+                                   self.register(sentence.right)])
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.instructions.append(instruction)
+        self.registers[sentence] = self.count
+        self.count += 1
+        return self.registers[sentence]
+
+    def run(self, inputs, full):
+        """
+        Evaluates every instruction on one block, given the mask of each
+        symbol in `inputs` and the all-ones mask `full`. Returns the list of
+        output masks.
+        """
+        values = list(inputs)
+        for op, operands in self.instructions:
+            if op == "not":
+                value = full ^ values[operands[0]]
+            elif op == "and":
+                value = full
+                for operand in operands:
+                    value &= values[operand]
+            elif op == "or":
+                value = 0
+                for operand in operands:
+                    value |= values[operand]
+            elif op == "implies":
+                value = (full ^ values[operands[0]]) | values[operands[1]]
+            else:
+                value = full ^ (values[operands[0]] ^ values[operands[1]])
+            values.append(value)
+        return [values[output] for output in self.outputs]
+
+
+def patterns(bits):
+    """
+    Returns the masks of the first `bits` symbols over a block of 2^bits
+    models, and the all-ones mask of the block.
+    """
+    size = 1 << bits
+    masks = []
+    for i in range(bits):
+        period = 1 << (i + 1)
+        mask = ((1 << (1 << i)) - 1) << (1 << i)
+        while period < size:
+            mask |= mask << period
+            period *= 2
+        masks.append(mask)
+    return masks, (1 << size) - 1
+
+
+def model_check(knowledge, query, block_bits=BLOCK_BITS):
+    """Checks if knowledge base entails query, a block of models at a time."""
+    names = sorted(set.union(knowledge.symbols(), query.symbols()))
+    program = Program([knowledge, query], names)
+
+    low = min(len(names), block_bits)
+    masks, full = patterns(low)
+    high = len(names) - low
+
+    for block in range(1 << high):
+        inputs = masks + [
+            full if (block >> i) & 1 else 0 for i in range(high)
+        ]
+        kb, q = program.run(inputs, full)
+        if kb & (full ^ q):
+            return False
+    return True
@@ -0,0 +1,248 @@
+"""
+Tic Tac Toe bitboards
+
+A position is two 9-bit masks, one with the cells taken by X and one with
+the cells taken by O. Cell (i, j) is bit i * 3 + j.
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Mask with every cell of the board
+FULL = 0b111111111
+
+# Masks of the rows, columns and diagonals
+WIN_MASKS = [0b000000111, 0b000111000, 0b111000000,
+             0b001001001, 0b010010010, 0b100100100,
+             0b100010001, 0b001010100]
+
+# Whether each set of cells contains a whole line
+WINS = [any(mask & line == line for line in WIN_MASKS)
+        for mask in range(FULL + 1)]
+
+# Order in which alpha-beta tries cells: center, then corners, then edges
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# Kinds of value stored in a transposition table
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# Number of positions visited by the searches, for comparing them
+stats = {"nodes": 0}
+
+# Last cell that caused a cutoff at each search depth (moves played)
+killers = dict()
+
+
+def symmetries():
+    """
+    Returns the 8 rotations and reflections of the board, each as the list
+    of cells that end up in each cell.
+    """
+    def rotate(cells):
+        return [cells[(2 - j) * 3 + i] for i in range(3) for j in range(3)]
+
+    def reflect(cells):
+        return [cells[i * 3 + 2 - j] for i in range(3) for j in range(3)]
+
+    result = []
+    for cells in (list(range(9)), reflect(list(range(9)))):
+        for _ in range(4):
+            result.append(cells)
+            cells = rotate(cells)
+    return result
+
+
+def transform(mask, symmetry):
+    """
+    Returns the mask with its cells moved by a symmetry.
+    """
+    moved = 0
+    for cell, source in enumerate(symmetry):
+        if mask >> source & 1:
+            moved |= 1 << cell
+    return moved
+
+
+# Each mask under each symmetry, looked up instead of recomputed
+TRANSFORMS = [[transform(mask, symmetry) for mask in range(FULL + 1)]
+              for symmetry in symmetries()]
+
+
+class Bitboard():
+    """
+    A tic-tac-toe position that is changed in place by playing and undoing
+    moves.
+    """
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+        self.moves = bin(x | o).count("1")
+
+    def player(self):
+        """
+        Returns player who has the next turn.
+        """
+        return X if self.moves % 2 == 0 else O
+
+    def actions(self):
+        """
+        Returns the list of empty cells.
+        """
+        taken = self.x | self.o
+        return [cell for cell in range(9) if not taken >> cell & 1]
+
+    def play(self, cell):
+        """
+        Takes an empty cell for the player who has the next turn.
+        """
+        if self.moves % 2 == 0:
+            self.x |= 1 << cell
+        else:
+            self.o |= 1 << cell
+        self.moves += 1
+
+    def undo(self, cell):
+        """
+        Takes back the move that took a cell.
+        """
+        self.x &= ~(1 << cell)
+        self.o &= ~(1 << cell)
+        self.moves -= 1
+
+    def winner(self):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        if WINS[self.x]:
+            return X
+        elif WINS[self.o]:
+            return O
+        return None
+
+    def terminal(self):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return WINS[self.x] or WINS[self.o] or self.moves == 9
+
+    def utility(self):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        if WINS[self.x]:
+            return 1
+        elif WINS[self.o]:
+            return -1
+        return 0
+
+    def canonical(self):
+        """
+        Returns a key shared by the position and all its rotations and
+        reflections, which have the same minimax value.
+        """
+        return min((moved[self.x], moved[self.o]) for moved in TRANSFORMS)
+
+
+def from_board(board):
+    """
+    Returns the bitboard of a list-of-lists board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (i * 3 + j)
+            elif cell == O:
+                o |= 1 << (i * 3 + j)
+    return Bitboard(x, o)
+
+
+def to_board(position):
+    """
+    Returns the list-of-lists board of a bitboard.
+    """
+    board = []
+    for i in range(3):
+        row = []
+        for j in range(3):
+            bit = 1 << (i * 3 + j)
+            row.append(X if position.x & bit else O if position.o & bit
+                       else EMPTY)
+        board.append(row)
+    return board
+
+
+def ordered_actions(position):
+    """
+    Returns the empty cells, the killer move at this depth first, then
+    center, corners and edges.
+    """
+    taken = position.x | position.o
+    ordered = [cell for cell in MOVE_ORDER if not taken >> cell & 1]
+    killer = killers.get(position.moves)
+    if killer in ordered:
+        ordered.remove(killer)
+        ordered.insert(0, killer)
+    return ordered
+
+
+def alpha_beta(position, alpha, beta, table=None):
+    """
+    Returns the minimax value of the position, or a bound on it when it
+    falls outside (alpha, beta): at most alpha, or at least beta.
+
+    If a transposition table is given, values and bounds found for earlier
+    positions are reused, and the result is stored in it. The position is
+    searched in place and left as it was.
+    """
+    stats["nodes"] += 1
+
+    if table is not None:
+        key = position.canonical()
+        if key in table:
+            value, flag = table[key]
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+        window = (alpha, beta)
+
+    if position.terminal():
+        return position.utility()
+
+    maximizing = position.moves % 2 == 0
+    v = float('-inf') if maximizing else float('inf')
+
+    for cell in ordered_actions(position):
+        position.play(cell)
+        value = alpha_beta(position, alpha, beta, table)
+        position.undo(cell)
+        if maximizing:
+            v = max(v, value)
+            alpha = max(alpha, v)
+        else:
+            v = min(v, value)
+            beta = min(beta, v)
+
+        # The opponent will avoid this position, so stop searching it
+        if alpha >= beta:
+            killers[position.moves] = cell
+            break
+
+    if table is not None:
+        if v <= window[0]:
+            table[key] = (v, UPPER)
+        elif v >= window[1]:
+            table[key] = (v, LOWER)
+        else:
+            table[key] = (v, EXACT)
+
+    return v
@@ -0,0 +1,418 @@
+"""
+K-in-a-row on N×N boards
+
+Generalizes tic-tac-toe to any board size and line length, e.g. 15×15
+gomoku with k = 5. Boards use the same list-of-lists format as
+tictactoe.py. Exhaustive search is impossible on large boards, so the AI
+searches with iterative deepening alpha-beta and scores the positions
+where it stops by their open lines, within a per-move time budget.
+"""
+
+import sys
+import time
+
+from tictactoe import InvalidMoveError
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Seconds the AI may spend choosing a move
+TIME_BUDGET = 1.0
+
+# Value of a won position, minus the number of moves it took to win
+WIN = 1000000
+
+# Positions visited between checks of the clock
+CHECK_EVERY = 256
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its time budget runs out.
+    """
+
+
+class Game():
+    """
+    The rules of k-in-a-row on a size × size board, with every line of k
+    cells precomputed.
+    """
+
+    def __init__(self, size=15, k=5):
+        if not 1 <= k <= size:
+            raise ValueError("line length must be between 1 and board size")
+        self.size = size
+        self.k = k
+
+        # Every run of k cells in a row, column or diagonal
+        self.lines = []
+        for i in range(size):
+            for j in range(size):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                    if 0 <= end_i < size and 0 <= end_j < size:
+                        self.lines.append([(i + n * di) * size + j + n * dj
+                                           for n in range(k)])
+
+        # Lines through each cell, and cells within two steps of it
+        self.cell_lines = [[] for _ in range(size * size)]
+        for index, line in enumerate(self.lines):
+            for cell in line:
+                self.cell_lines[cell].append(index)
+        self.neighbors = []
+        for i in range(size):
+            for j in range(size):
+                self.neighbors.append([
+                    ni * size + nj
+                    for ni in range(max(0, i - 2), min(size, i + 3))
+                    for nj in range(max(0, j - 2), min(size, j + 3))
+                    if (ni, nj) != (i, j)
+                ])
+
+        # Score of a line holding only one player's marks, by their number
+        self.weights = [0] + [4 ** n for n in range(1, k + 1)]
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.size for _ in range(self.size)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        return Position(self, board).player()
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        return {(i, j) for i in range(self.size) for j in range(self.size)
+                if board[i][j] == EMPTY}
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        i, j = action
+        if not (0 <= i < self.size and 0 <= j < self.size):
+            raise InvalidMoveError('The move is not valid. The index is out of range.')
+        if board[i][j] != EMPTY:
+            raise InvalidMoveError('The move is not valid. The cell is already taken.')
+        new = [list(row) for row in board]
+        new[i][j] = self.player(board)
+        return new
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        return Position(self, board).winner()
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return Position(self, board).terminal()
+
+
+class Position():
+    """
+    A board that is changed in place by playing and undoing moves, keeping
+    the number of each player's marks in every line up to date.
+    """
+
+    def __init__(self, game, board=None):
+        self.game = game
+        self.cells = [EMPTY] * (game.size * game.size)
+        self.counts = {X: [0] * len(game.lines), O: [0] * len(game.lines)}
+        self.complete = {X: 0, O: 0}
+        self.score = 0
+        self.stones = []
+
+        # Replay the board's marks, alternating X and O
+        if board is not None:
+            marks = {X: [], O: []}
+            for i, row in enumerate(board):
+                for j, cell in enumerate(row):
+                    if cell != EMPTY:
+                        marks[cell].append(i * game.size + j)
+            if not 0 <= len(marks[X]) - len(marks[O]) <= 1:
+                raise ValueError("board is not reachable by alternating moves")
+            for n in range(len(marks[X]) + len(marks[O])):
+                self.play(marks[X if n % 2 == 0 else O][n // 2])
+
+    def player(self):
+        """
+        Returns player who has the next turn.
+        """
+        return X if len(self.stones) % 2 == 0 else O
+
+    def line_score(self, line):
+        """
+        Returns the heuristic value of one line for X: positive when only X
+        can still complete it, negative when only O can.
+        """
+        x, o = self.counts[X][line], self.counts[O][line]
+        if x and o:
+            return 0
+        return self.game.weights[x] - self.game.weights[o]
+
+    def play(self, cell):
+        """
+        Takes an empty cell for the player who has the next turn.
+        """
+        mark = self.player()
+        counts = self.counts[mark]
+        for line in self.game.cell_lines[cell]:
+            self.score -= self.line_score(line)
+            counts[line] += 1
+            if counts[line] == self.game.k:
+                self.complete[mark] += 1
+            self.score += self.line_score(line)
+        self.cells[cell] = mark
+        self.stones.append(cell)
+
+    def undo(self):
+        """
+        Takes back the last move.
+        """
+        cell = self.stones.pop()
+        mark = self.cells[cell]
+        counts = self.counts[mark]
+        for line in self.game.cell_lines[cell]:
+            self.score -= self.line_score(line)
+            if counts[line] == self.game.k:
+                self.complete[mark] -= 1
+            counts[line] -= 1
+            self.score += self.line_score(line)
+        self.cells[cell] = EMPTY
+
+    def winner(self):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        if self.complete[X]:
+            return X
+        elif self.complete[O]:
+            return O
+        return None
+
+    def terminal(self):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (self.winner() is not None
+                or len(self.stones) == len(self.cells))
+
+    def evaluate(self):
+        """
+        Returns the value of the position for X: the value of a win or loss
+        (sooner being better), 0 for a draw, or else the sum of the open
+        lines' scores.
+        """
+        winner = self.winner()
+        if winner == X:
+            return WIN - len(self.stones)
+        elif winner == O:
+            return -(WIN - len(self.stones))
+        elif len(self.stones) == len(self.cells):
+            return 0
+        return self.score
+
+    def candidates(self):
+        """
+        Returns the empty cells within two steps of a mark (the center on an
+        empty board), the most promising first.
+        """
+        if not self.stones:
+            center = self.game.size // 2
+            return [center * self.game.size + center]
+
+        cells = set()
+        for stone in self.stones:
+            for cell in self.game.neighbors[stone]:
+                if self.cells[cell] == EMPTY:
+                    cells.add(cell)
+
+        # Prefer cells on lines that either player could still complete
+        weights = self.game.weights
+        counts_x, counts_o = self.counts[X], self.counts[O]
+
+        def urgency(cell):
+            total = 0
+            for line in self.game.cell_lines[cell]:
+                x, o = counts_x[line], counts_o[line]
+                if not (x and o):
+                    total += weights[x] + weights[o]
+            return total
+
+        return sorted(cells, key=lambda cell: (-urgency(cell), cell))
+
+
+class Search():
+    """
+    Iterative deepening alpha-beta search of a position, stopping when a
+    time budget runs out.
+
+    If `shared` is given, it is called every `CHECK_EVERY` positions and
+    returns a (floor, ceiling) window that bounds every node's (alpha,
+    beta), so searches running side by side can narrow each other's
+    windows.
+    """
+
+    def __init__(self, budget=TIME_BUDGET, max_depth=None, shared=None):
+        self.budget = budget
+        self.max_depth = max_depth
+        self.shared = shared
+        self.floor, self.ceiling = -float("inf"), float("inf")
+        self.deadline = None
+        self.nodes = 0
+        self.depth = 0
+        self.exhaustive = True
+
+    def value(self, position, depth, alpha, beta):
+        """
+        Returns the value of the position searched `depth` moves ahead, or a
+        bound on it when it falls outside (alpha, beta).
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            if (self.deadline is not None
+                    and time.perf_counter() > self.deadline):
+                raise SearchTimeout()
+            if self.shared is not None:
+                self.floor, self.ceiling = self.shared()
+
+        if position.terminal():
+            return position.evaluate()
+        if depth == 0:
+            self.exhaustive = False
+            return position.evaluate()
+
+        maximizing = position.player() == X
+        v = -float("inf") if maximizing else float("inf")
+        for cell in position.candidates():
+            alpha, beta = max(alpha, self.floor), min(beta, self.ceiling)
+            if alpha >= beta:
+                break
+            position.play(cell)
+            try:
+                value = self.value(position, depth - 1, alpha, beta)
+            finally:
+                position.undo()
+            if maximizing:
+                v = max(v, value)
+                alpha = max(alpha, v)
+            else:
+                v = min(v, value)
+                beta = min(beta, v)
+            if alpha >= beta:
+                break
+
+        # A window closed by the shared bound says nothing about this
+        # position: return a value its parent ignores, so the ancestor
+        # whose result is already beyond the bound decides
+        if maximizing and self.floor >= beta:
+            return float("inf")
+        if not maximizing and self.ceiling <= alpha:
+            return -float("inf")
+        return v
+
+    def root(self, position, depth, first=None):
+        """
+        Returns the best cell and its value searching `depth` moves ahead,
+        trying the cell `first` before the others.
+        """
+        cells = position.candidates()
+        if first in cells:
+            cells.remove(first)
+            cells.insert(0, first)
+
+        maximizing = position.player() == X
+        best, best_value = None, None
+        alpha, beta = -float("inf"), float("inf")
+        for cell in cells:
+            position.play(cell)
+            try:
+                value = self.value(position, depth - 1, alpha, beta)
+            finally:
+                position.undo()
+            if best is None or (value > best_value if maximizing
+                                else value < best_value):
+                best, best_value = cell, value
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+        return best, best_value
+
+    def run(self, position):
+        """
+        Returns the best cell found within the time budget, searching one
+        move deeper at a time and keeping the result of the deepest search
+        that finished.
+        """
+        self.deadline = time.perf_counter() + self.budget
+        self.nodes = 0
+        empty = len(position.cells) - len(position.stones)
+        limit = empty if self.max_depth is None else min(empty, self.max_depth)
+
+        cells = position.candidates()
+        best = cells[0]
+        if len(cells) == 1:
+            return best
+        for depth in range(1, limit + 1):
+            self.exhaustive = True
+            try:
+                cell, value = self.root(position, depth, best)
+            except SearchTimeout:
+                break
+            best = cell
+            self.depth = depth
+
+            # Deeper searches cannot change a decided game
+            if self.exhaustive or abs(value) >= WIN - len(position.cells):
+                break
+        return best
+
+
+def best_move(game, board, budget=TIME_BUDGET, max_depth=None):
+    """
+    Returns the action (i, j) the AI chooses for the current player on the
+    board, or None if the game is over.
+    """
+    position = Position(game, board)
+    if position.terminal():
+        return None
+    cell = Search(budget, max_depth).run(position)
+    return divmod(cell, game.size)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [3, 4]:
+        sys.exit("Usage: python kinarow.py size k [seconds]")
+    size, k = int(sys.argv[1]), int(sys.argv[2])
+    budget = float(sys.argv[3]) if len(sys.argv) == 4 else TIME_BUDGET
+
+    # Let the AI play both sides, showing every move
+    game = Game(size, k)
+    board = game.initial_state()
+    while not game.terminal(board):
+        start = time.perf_counter()
+        move = best_move(game, board, budget)
+        seconds = time.perf_counter() - start
+        print(f"{game.player(board)} plays {move} in {seconds:.2f}s")
+        board = game.result(board, move)
+    for row in board:
+        print(" ".join(cell or "." for cell in row))
+    winner = game.winner(board)
+    print(f"Game Over: {winner} wins." if winner else "Game Over: Tie.")
+
+
+if __name__ == "__main__":
+    main()
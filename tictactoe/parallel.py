@@ -0,0 +1,213 @@
+"""
+Parallel root-split search
+
+The root's first move is searched on its own, as in "young brothers wait":
+its value becomes the bound the remaining moves have to beat, and those
+are then searched in parallel by a pool of worker processes. Workers share
+the best value found so far, so a move searched after a good one has been
+found starts with a narrower window and prunes more. K-in-a-row searches
+also read the shared value again as they run, and narrow their windows
+when another worker improves it.
+
+A move whose search failed to beat the bound it used only has a bound on
+its value. The best move is chosen among exact values, in root order,
+searching a move again when its bound could hide a tie or a better value,
+so the result is the same as a sequential search.
+
+The worker processes are started once and kept for later searches.
+"""
+
+import concurrent.futures
+import functools
+import multiprocessing
+
+import bitboard
+import kinarow
+import tictactoe as ttt
+
+# Best value found so far at the root, as seen by a worker process
+best_bound = None
+
+# Pool of worker processes kept between searches, its size and the bound
+# its workers share
+executor = None
+executor_workers = None
+executor_bound = None
+
+
+def start_worker(bound):
+    """
+    Sets the shared bound in a new worker process.
+    """
+    global best_bound
+    best_bound = bound
+
+
+def worker_pool(workers=None):
+    """
+    Returns the pool of worker processes, starting it on first use or when
+    a different number of workers is asked for.
+    """
+    global executor, executor_workers, executor_bound
+    if executor is None or workers != executor_workers:
+        if executor is not None:
+            executor.shutdown()
+        executor_bound = multiprocessing.Value("d", 0.0)
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=start_worker,
+            initargs=(executor_bound,)
+        )
+        executor_workers = workers
+    return executor
+
+
+def shared_window(maximizing):
+    """
+    Returns the (floor, ceiling) window that the shared bound currently
+    allows: moves must beat it, from below when maximizing and from above
+    otherwise.
+    """
+    with best_bound.get_lock():
+        limit = best_bound.value
+    if maximizing:
+        return limit, float("inf")
+    return -float("inf"), limit
+
+
+def search_task(work, arguments, maximizing):
+    """
+    Searches one root move in a worker, starting from the shared bound.
+    Returns the value found, a bound at least as tight as every one the
+    search used, and the number of positions visited.
+    """
+    alpha, beta = shared_window(maximizing)
+    value, nodes = work(*arguments, alpha, beta)
+
+    with best_bound.get_lock():
+        limit = best_bound.value
+        if value > limit if maximizing else value < limit:
+            best_bound.value = value
+    return value, limit, nodes
+
+
+def root_split(work, tasks, maximizing, workers=None, best_possible=None):
+    """
+    Searches every root move with `work(*task, alpha, beta)`, which returns
+    a value and a number of positions visited. Returns the index of the
+    first best task, its value and the total number of positions visited.
+
+    Stops early if the first move reaches `best_possible`.
+    """
+    inf = float("inf")
+    best_value, nodes = work(*tasks[0], -inf, inf)
+    if best_value == best_possible or len(tasks) == 1:
+        return 0, best_value, nodes
+
+    pool = worker_pool(workers)
+    with executor_bound.get_lock():
+        executor_bound.value = best_value
+    futures = [pool.submit(search_task, work, task, maximizing)
+               for task in tasks[1:]]
+    results = [future.result() for future in futures]
+
+    best = 0
+    for i, (value, limit, count) in enumerate(results, start=1):
+        nodes += count
+        if not (value > best_value if maximizing else value < best_value):
+            continue
+
+        # A value that did not beat the bound it used is only a bound
+        exact = value > limit if maximizing else value < limit
+        if not exact:
+            if maximizing:
+                value, count = work(*tasks[i], best_value, inf)
+            else:
+                value, count = work(*tasks[i], -inf, best_value)
+            nodes += count
+            if not (value > best_value if maximizing else value < best_value):
+                continue
+        best, best_value = i, value
+    return best, best_value, nodes
+
+
+def search_tictactoe(x, o, cell, alpha, beta):
+    """
+    Returns the value of playing `cell` on the bitboard with masks x and o,
+    or a bound on it outside (alpha, beta), and the positions visited.
+
+    The window is fixed for the whole search, since the values stored in
+    the transposition table are bounds relative to it.
+    """
+    position = bitboard.Bitboard(x, o)
+    position.play(cell)
+    start = bitboard.stats["nodes"]
+    value = bitboard.alpha_beta(position, alpha, beta, ttt.transpositions)
+    return value, bitboard.stats["nodes"] - start
+
+
+def parallel_minimax(board, workers=None):
+    """
+    Returns the optimal action for the current player on the board, the
+    same one as `tictactoe.minimax`, searching the actions after the first
+    in parallel.
+    """
+    if ttt.terminal(board):
+        return None
+
+    position = bitboard.from_board(board)
+    actions = list(ttt.actions(board))
+    tasks = [(position.x, position.o, i * 3 + j) for i, j in actions]
+    maximizing = ttt.player(board) == ttt.X
+    best, _, _ = root_split(search_tictactoe, tasks, maximizing, workers,
+                            best_possible=1 if maximizing else -1)
+    return actions[best]
+
+
+@functools.lru_cache(maxsize=None)
+def kinarow_game(size, k):
+    """
+    Returns the (cached) rules of k-in-a-row on a size × size board, so
+    workers build each game once instead of receiving it with every task.
+    """
+    return kinarow.Game(size, k)
+
+
+def search_kinarow(size, k, stones, cell, depth, alpha, beta):
+    """
+    Returns the value of playing `cell` after the moves `stones` on a
+    k-in-a-row board, searched `depth` moves ahead counting this one, or a
+    bound on it outside (alpha, beta), and the positions visited.
+
+    In a worker, the window narrows whenever another worker improves the
+    shared bound.
+    """
+    position = kinarow.Position(kinarow_game(size, k))
+    for stone in stones:
+        position.play(stone)
+    maximizing = position.player() == kinarow.X
+    position.play(cell)
+
+    shared = None
+    if best_bound is not None:
+        shared = functools.partial(shared_window, maximizing)
+    search = kinarow.Search(shared=shared)
+    value = search.value(position, depth - 1, alpha, beta)
+    return value, search.nodes
+
+
+def parallel_best_move(game, board, depth, workers=None):
+    """
+    Returns the action (i, j) the k-in-a-row AI chooses for the current
+    player on the board searching `depth` moves ahead, splitting the
+    candidate moves between worker processes, or None if the game is over.
+    """
+    position = kinarow.Position(game, board)
+    if position.terminal():
+        return None
+
+    cells = position.candidates()
+    tasks = [(game.size, game.k, list(position.stones), cell, depth)
+             for cell in cells]
+    maximizing = position.player() == kinarow.X
+    best, _, _ = root_split(search_kinarow, tasks, maximizing, workers)
+    return divmod(cells[best], game.size)
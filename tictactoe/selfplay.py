@@ -0,0 +1,155 @@
+import argparse
+import json
+import random
+import time
+
+import tictactoe as ttt
+
+# Engines that choose a move for the current player, by name
+ENGINES = {
+    "plain": ttt.plain_minimax,
+    "pruned": lambda board: ttt.minimax(board, cache=False, bitboards=False,
+                                        use_tablebase=False),
+    "cached": lambda board: ttt.minimax(board, bitboards=False,
+                                        use_tablebase=False),
+    "bitboard": lambda board: ttt.minimax(board, use_tablebase=False),
+    "tablebase": ttt.minimax
+}
+
+# Most games each engine plays per mode, for engines too slow for many
+GAME_LIMITS = {
+    "plain": 4
+}
+
+# Percentiles of move latency that are reported
+PERCENTILES = [50, 90, 99]
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python selfplay.py [--games N] [--engines NAME ...] "
+              "[--seed N] [--output FILE]"
+    )
+    parser.add_argument(
+        "--games", type=int, default=1000,
+        help="number of games each engine plays in each mode"
+    )
+    parser.add_argument(
+        "--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES),
+        help="engines to measure"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", default=None, help="file to write JSON results to"
+    )
+    args = parser.parse_args()
+
+    if ttt.tablebase is None and "tablebase" in args.engines:
+        print("No tablebase file found: the tablebase engine will search.")
+
+    results = []
+    print(f"{'engine':<10} {'mode':<10} {'games':>6} {'X':>5} {'O':>5} "
+          f"{'tie':>5} {'nodes/move':>11} "
+          + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES))
+    for name in args.engines:
+        for mode in ("ai", "random"):
+            games = min(args.games, GAME_LIMITS.get(name, args.games))
+            rng = random.Random(args.seed)
+            result = measure(ENGINES[name], mode, games, rng)
+            result["engine"] = name
+            results.append(result)
+            outcomes = result["outcomes"]
+            print(f"{name:<10} {mode:<10} {games:>6} {outcomes['X']:>5} "
+                  f"{outcomes['O']:>5} {outcomes['tie']:>5} "
+                  f"{result['nodes_per_move']:>11.1f} "
+                  + " ".join(f"{result['latency_ms'][f'p{p}']:>9.3f}"
+                             for p in PERCENTILES))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def play_game(engine, ai_players, rng):
+    """
+    Play one game in which the players in `ai_players` move with `engine`
+    and the others move at random. Return the winner (None for a tie) and
+    the latency in seconds and positions searched of every AI move.
+    """
+    ttt.clear_transpositions()
+    board = ttt.initial_state()
+    latencies = []
+    nodes = []
+    while not ttt.terminal(board):
+        if ttt.player(board) in ai_players:
+            start_nodes = ttt.stats["nodes"]
+            start = time.perf_counter()
+            action = engine(board)
+            latencies.append(time.perf_counter() - start)
+            nodes.append(ttt.stats["nodes"] - start_nodes)
+        else:
+            action = rng.choice(sorted(ttt.actions(board)))
+        board = ttt.result(board, action)
+    return ttt.winner(board), latencies, nodes
+
+
+def percentile(values, p):
+    """
+    Return the p-th percentile of `values` by the nearest-rank method.
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def measure(engine, mode, games, rng):
+    """
+    Play `games` games with `engine`, either against itself (mode "ai") or
+    against a random player (mode "random"), the AI taking X and O in
+    turn. Return a dictionary of outcomes, positions searched and move
+    latencies.
+    """
+    outcomes = {"X": 0, "O": 0, "tie": 0}
+    ai_outcomes = {"win": 0, "loss": 0, "tie": 0}
+    latencies = []
+    nodes = []
+    for game in range(games):
+        if mode == "ai":
+            ai_players = {ttt.X, ttt.O}
+        else:
+            ai_players = {ttt.X if game % 2 == 0 else ttt.O}
+        winner, game_latencies, game_nodes = play_game(engine, ai_players, rng)
+        latencies.extend(game_latencies)
+        nodes.extend(game_nodes)
+
+        outcomes[winner or "tie"] += 1
+        if mode == "random":
+            if winner is None:
+                ai_outcomes["tie"] += 1
+            elif winner in ai_players:
+                ai_outcomes["win"] += 1
+            else:
+                ai_outcomes["loss"] += 1
+
+    result = {
+        "mode": mode,
+        "games": games,
+        "moves": len(latencies),
+        "outcomes": outcomes,
+        "nodes": sum(nodes),
+        "nodes_per_move": sum(nodes) / len(nodes) if nodes else 0,
+        "latency_ms": {
+            f"p{p}": percentile(latencies, p) * 1000 if latencies else 0
+            for p in PERCENTILES
+        }
+    }
+    result["latency_ms"]["max"] = max(latencies, default=0) * 1000
+    if mode == "random":
+        result["ai_outcomes"] = ai_outcomes
+    return result
+
+
+if __name__ == "__main__":
+    main()
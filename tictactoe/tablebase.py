@@ -0,0 +1,95 @@
+"""
+Tic Tac Toe tablebase generator
+
+Solves every position reachable in a game once, by retrograde analysis:
+positions are grouped by the number of moves played and solved from the
+full boards back to the empty one, so the values of every position's
+successors are known when it is solved. Writes each position's value and
+best move to the file that tictactoe.minimax reads.
+"""
+
+import sys
+
+import bitboard
+import tictactoe as ttt
+
+
+def reachable():
+    """
+    Returns the bitboards reachable from the empty board, as one dictionary
+    per number of moves played, keyed by their (x, o) masks.
+    """
+    layers = [{(0, 0): bitboard.Bitboard()}]
+    for _ in range(9):
+        layer = dict()
+        for position in layers[-1].values():
+            if position.terminal():
+                continue
+            for cell in position.actions():
+                position.play(cell)
+                if (position.x, position.o) not in layer:
+                    layer[(position.x, position.o)] = bitboard.Bitboard(
+                        position.x, position.o
+                    )
+                position.undo(cell)
+        layers.append(layer)
+    return layers
+
+
+def solve():
+    """
+    Returns a dictionary from the (x, o) masks of every reachable position
+    to its minimax value and best move (None if the game is over).
+
+    The best move is the first optimal action in `tictactoe.actions` order,
+    the one `minimax` chooses when it searches.
+    """
+    solutions = dict()
+    for layer in reversed(reachable()):
+        for key, position in layer.items():
+            if position.terminal():
+                solutions[key] = (position.utility(), None)
+                continue
+
+            maximizing = position.player() == ttt.X
+            best, best_value = None, None
+            for action in ttt.actions(bitboard.to_board(position)):
+                cell = action[0] * 3 + action[1]
+                position.play(cell)
+                value, _ = solutions[(position.x, position.o)]
+                position.undo(cell)
+                if best is None or (value > best_value if maximizing
+                                    else value < best_value):
+                    best, best_value = action, value
+            solutions[key] = (best_value, best)
+    return solutions
+
+
+def encode(solutions):
+    """
+    Returns the tablebase bytes of the solved positions, in the format read
+    by `tictactoe.load_tablebase`.
+    """
+    table = bytearray([ttt.UNREACHABLE] * 3 ** 9)
+    for (x, o), (value, action) in solutions.items():
+        board = bitboard.to_board(bitboard.Bitboard(x, o))
+        move = ttt.NO_MOVE if action is None else action[0] * 3 + action[1]
+        table[ttt.position_index(board)] = (value + 1) << 4 | move
+    return bytes(table)
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python tablebase.py [filename]")
+    filename = sys.argv[1] if len(sys.argv) == 2 else ttt.TABLEBASE_FILE
+
+    solutions = solve()
+    with open(filename, "wb") as f:
+        f.write(encode(solutions))
+    print(f"Solved {len(solutions)} positions into {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,43 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
+import os
+
+import bitboard
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Order in which alpha-beta tries moves: center, then corners, then edges
+MOVE_ORDER = [(1, 1),
+              (0, 0), (0, 2), (2, 0), (2, 2),
+              (0, 1), (1, 0), (1, 2), (2, 1)]
+
+# Number of positions visited by the searches, for comparing them
+stats = bitboard.stats
+
+# Last move that caused a cutoff at each search depth (moves played)
+killers = dict()
+
+# Kinds of value stored in the transposition table
+EXACT = bitboard.EXACT
+LOWER = bitboard.LOWER
+UPPER = bitboard.UPPER
+
+# Values of positions searched so far, keyed by canonical board
+transpositions = dict()
+
+# File with the value and best move of every position, made by tablebase.py
+TABLEBASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "tablebase.bin")
+
+# Tablebase byte of positions that cannot be reached in a game
+UNREACHABLE = 0xFF
+
+# Tablebase move of positions where the game is over
+NO_MOVE = 0x0F
+
 
 class InvalidMoveError(Exception):
     """
@@ -31,17 +62,7 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    if board == initial_state():
-        return X
-    
-    # Count number of X and O in board
-    count_X = sum(row.count('X') for row in board)
-    count_O = sum(row.count('O') for row in board)
-
-    if count_O < count_X:
-        return O
-    else:
-        return X
+    return bitboard.from_board(board).player()
 
 
 def actions(board):
@@ -74,59 +95,27 @@ def result(board, action):
     elif board[i][j] != EMPTY:
         raise InvalidMoveError('The move is not valid. The cell is already taken.')
 
-    # Create a deepcopy of board
-    board_dp = copy.deepcopy(board)
+    # Copy the rows of the board, which only hold strings
+    board_copy = [list(row) for row in board]
 
     # Make the move
-    board_dp[i][j] = player(board)
+    board_copy[i][j] = player(board)
 
-    return board_dp
+    return board_copy
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Verify if there was a winner horizontally
-    for row in board:
-        if row.count(X) == 3:
-            return X
-        elif row.count(O) == 3:
-            return O
-    
-    # Verify if there was a winner vertically
-    for j in range(len(board)):
-        column = []
-        for row in board:
-            column.append(row[j])
-        if column.count(X) == 3:
-            return X
-        elif column.count(O) == 3:
-            return O
-
-    # Verify if there was a winner on the diagonal
-    first_diagonal = [board[i][i] for i in range(len(board))]
-    second_diagonal = [board[i][len(board) - 1 - i] for i in range(len(board))]
-
-    if first_diagonal.count(X) == 3 or second_diagonal.count(X) == 3:
-        return X
-    elif first_diagonal.count(O) == 3 or second_diagonal.count(O) == 3:
-        return O
-    
-    # If there was no winner
-    return None
+    return bitboard.from_board(board).winner()
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) != None:
-        return True
-    elif sum(row.count(EMPTY) for row in board) == 0:
-        return True
-    else:
-        return False
+    return bitboard.from_board(board).terminal()
 
 
 
@@ -134,16 +123,12 @@ def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
-        return 1
-    elif winner(board) == O:
-        return -1
-    else:
-        return 0
+    return bitboard.from_board(board).utility()
     
 
 def max_value(board):
 
+    stats["nodes"] += 1
     v = float('-inf')
 
     if terminal(board):
@@ -156,6 +141,7 @@ def max_value(board):
 
 def min_value(board):
 
+    stats["nodes"] += 1
     v = float('inf')
 
     if terminal(board):
@@ -167,9 +153,95 @@ def min_value(board):
     return v
 
 
-def minimax(board):
+def ordered_actions(board, depth):
     """
-    Returns the optimal action for the current player on the board.
+    Returns the actions available on the board, the killer move at this
+    depth first, then center, corners and edges.
+    """
+    ordered = [action for action in MOVE_ORDER
+               if board[action[0]][action[1]] == EMPTY]
+    killer = killers.get(depth)
+    if killer in ordered:
+        ordered.remove(killer)
+        ordered.insert(0, killer)
+    return ordered
+
+
+def canonical(board):
+    """
+    Returns a key shared by the board and all its rotations and
+    reflections, which have the same minimax value.
+    """
+    return bitboard.from_board(board).canonical()
+
+
+def clear_transpositions():
+    """
+    Empties the transposition table.
+    """
+    transpositions.clear()
+
+
+def alpha_beta(board, alpha, beta, table=None):
+    """
+    Returns the minimax value of the board, or a bound on it when it falls
+    outside (alpha, beta): at most alpha, or at least beta.
+
+    If a transposition table is given, values and bounds found for earlier
+    positions are reused, and the result is stored in it.
+    """
+    stats["nodes"] += 1
+
+    if table is not None:
+        key = canonical(board)
+        if key in table:
+            value, flag = table[key]
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+        window = (alpha, beta)
+
+    if terminal(board):
+        return utility(board)
+
+    depth = 9 - sum(row.count(EMPTY) for row in board)
+    maximizing = player(board) == X
+    v = float('-inf') if maximizing else float('inf')
+
+    for action in ordered_actions(board, depth):
+        value = alpha_beta(result(board, action), alpha, beta, table)
+        if maximizing:
+            v = max(v, value)
+            alpha = max(alpha, v)
+        else:
+            v = min(v, value)
+            beta = min(beta, v)
+
+        # The opponent will avoid this position, so stop searching it
+        if alpha >= beta:
+            killers[depth] = action
+            break
+
+    if table is not None:
+        if v <= window[0]:
+            table[key] = (v, UPPER)
+        elif v >= window[1]:
+            table[key] = (v, LOWER)
+        else:
+            table[key] = (v, EXACT)
+
+    return v
+
+
+def plain_minimax(board):
+    """
+    Returns the optimal action for the current player on the board,
+    searching the whole game tree without pruning.
     """
     if terminal(board):
         return None
@@ -193,14 +265,123 @@ def minimax(board):
                 action =  possible_action
         
         return action
-    
 
 
+def position_index(board):
+    """
+    Returns the index of the board in the tablebase: the board read as a
+    base-3 number, cell (i, j) being digit i * 3 + j with EMPTY, X and O
+    as 0, 1 and 2.
+    """
+    index = 0
+    for cell in reversed([cell for row in board for cell in row]):
+        index = index * 3 + (1 if cell == X else 2 if cell == O else 0)
+    return index
+
+
+def load_tablebase(filename=TABLEBASE_FILE):
+    """
+    Returns the contents of the tablebase file, or None if there is none.
 
+    Each position has one byte at its `position_index`: the best move's
+    cell (i * 3 + j, or NO_MOVE) in the low 4 bits and its value plus 1 in
+    the next 2 bits, or UNREACHABLE.
+    """
+    try:
+        with open(filename, "rb") as f:
+            table = f.read()
+    except FileNotFoundError:
+        return None
+    if len(table) != 3 ** 9:
+        return None
+    return table
 
 
+tablebase = load_tablebase()
 
 
+def minimax(board, cache=True, bitboards=True, use_tablebase=True):
+    """
+    Returns the optimal action for the current player on the board.
 
+    With `use_tablebase`, the action is read from the tablebase when it has
+    been generated. Otherwise the board is searched with alpha-beta
+    pruning, but tries the actions at the root in the same order as
+    `plain_minimax` and only replaces the best action with a strictly
+    better one, so both return the same action. With `cache`,
+    positions are looked up in the transposition table, which is kept
+    between calls. With `bitboards`, the search below the root plays and
+    undoes moves on a single bitboard instead of copying lists.
+    """
+    if terminal(board):
+        return None
 
+    if use_tablebase and tablebase is not None:
+        entry = tablebase[position_index(board)]
+        if entry != UNREACHABLE:
+            return divmod(entry & 0x0F, 3)
+
+    killers.clear()
+    bitboard.killers.clear()
+    table = transpositions if cache else None
+    position = bitboard.from_board(board)
+
+    def search(action, alpha, beta):
+        if not bitboards:
+            return alpha_beta(result(board, action), alpha, beta, table)
+        cell = action[0] * 3 + action[1]
+        position.play(cell)
+        value = bitboard.alpha_beta(position, alpha, beta, table)
+        position.undo(cell)
+        return value
 
+    if player(board) == X:
+        highest_value = float('-inf')
+        for possible_action in actions(board):
+            value = search(possible_action, highest_value, float('inf'))
+            if value > highest_value:
+                highest_value = value
+                action = possible_action
+
+            # Nothing beats a win
+            if highest_value == 1:
+                break
+
+        return action
+
+    else:
+        lowest_value = float('inf')
+        for possible_action in actions(board):
+            value = search(possible_action, float('-inf'), lowest_value)
+            if value < lowest_value:
+                lowest_value = value
+                action = possible_action
+
+            if lowest_value == -1:
+                break
+
+        return action
+
+
+def compare_searches(board):
+    """
+    Returns the number of positions visited to choose an action on the
+    board by `plain_minimax`, and by `minimax` on lists without and with
+    the transposition table and on bitboards with it. Each cached search
+    starts from an empty table.
+    """
+    searches = {
+        "plain": plain_minimax,
+        "pruned": lambda board: minimax(board, cache=False, bitboards=False,
+                                        use_tablebase=False),
+        "cached": lambda board: minimax(board, bitboards=False,
+                                        use_tablebase=False),
+        "bitboard": lambda board: minimax(board, use_tablebase=False)
+    }
+    counts = dict()
+    for name, search in searches.items():
+        clear_transpositions()
+        stats["nodes"] = 0
+        search(board)
+        counts[name] = stats["nodes"]
+    return counts